@@ -0,0 +1,366 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+
+from itertools import count
+from uuid import uuid4
+
+import asyncpg
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.db_config import DatabaseSettings, db_settings, async_session
+from config.app_config import (invalidation_bus_enabled, invalidation_channel, invalidation_gap_timeout,
+                               invalidation_max_backoff)
+from auth.cache import user_cache
+from books.cache import genre_cache, author_cache, book_reads, search_reads
+from books.search_cache import search_cache
+from books.search_index import search_engine
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads are capped at 8000 bytes; longer id lists are sent as the range they span.
+MAX_PAYLOAD = 7000
+MAX_MISSING = 1000
+
+
+class InvalidationBus:
+
+    # Every worker LISTENs on one channel. Writers queue messages on the session and send them with pg_notify
+    # just before commit, so Postgres delivers them only if the transaction commits.
+    def __init__(self, settings: DatabaseSettings, enabled: bool, channel: str = "cache_invalidation",
+                 gap_timeout: float = 5.0, max_backoff: float = 30.0, session_factory=None):
+
+        self.settings = settings
+        self.enabled = enabled
+        self.channel = channel
+        self.gap_timeout = gap_timeout
+        self.max_backoff = max_backoff
+        self.session_factory = session_factory
+        self.worker_id = uuid4().hex[:12]
+        self.handlers = {}
+        self.flush_actions = []
+        self.connected = False
+        self.received = 0
+        self.flushes = 0
+        self.reconnects = 0
+        self._sequence = count(1)
+        self._skipped = []
+        self._pending = set()
+        self._senders = {}
+        self._queue = None
+        self._task = None
+
+    def handler(self, kind: str):
+
+        def register(function):
+            self.handlers[kind] = function
+            return function
+
+        return register
+
+    def on_flush(self, function):
+
+        self.flush_actions.append(function)
+        return function
+
+    def publish(self, session: AsyncSession, kind: str, **fields):
+
+        if self.enabled:
+            session.sync_session.info.setdefault("invalidations", {}).setdefault(self, []).append({"k": kind, **fields})
+
+    def envelope(self, message: dict) -> dict:
+
+        if message.get("ids") and len(json.dumps(message["ids"])) > MAX_PAYLOAD:
+            ids = message["ids"]
+            message = {**{key: value for key, value in message.items() if key != "ids"}, "range": [min(ids), max(ids)]}
+
+        # Sequence numbers are taken at send time, per worker, so receivers can tell when one went missing.
+        # Numbers given back by failed commits ride along, so receivers stop waiting for them.
+        envelope = {**message, "w": self.worker_id, "s": next(self._sequence)}
+        if self._skipped:
+            envelope["x"], self._skipped = self._skipped, []
+
+        return envelope
+
+    def encode(self, message: dict) -> str:
+
+        return json.dumps(self.envelope(message), separators=(",", ":"))
+
+    def send(self, session: Session, messages: list):
+
+        envelopes = [self.envelope(message) for message in messages]
+        session.info.setdefault("invalidation_sequences", {})[self] = [
+            sequence for envelope in envelopes for sequence in (envelope["s"], *envelope.get("x", ()))
+        ]
+
+        payloads = [json.dumps(envelope, separators=(",", ":")) for envelope in envelopes]
+        session.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+            {"channel": self.channel, "payloads": payloads}
+        )
+
+    def release(self, sequences: list):
+
+        # The commit that took these numbers failed, so Postgres dropped its notifications. Left alone, the
+        # hole would make every other worker flush once gap_timeout passes.
+        self._skipped.extend(sequences)
+
+        # One announcement at a time; numbers given back meanwhile wait for it or for the next message.
+        if self.session_factory is None or self._pending:
+            return
+
+        try:
+            task = asyncio.get_running_loop().create_task(self._send_skipped())
+        except RuntimeError:
+            return
+
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _send_skipped(self):
+
+        if not self._skipped:
+            return
+
+        try:
+            async with self.session_factory() as session:
+                self.publish(session, "skip")
+                await session.commit()
+        except Exception as e:
+            logger.warning("Could not announce skipped invalidation messages: %s", e)
+
+    def _receive(self, connection, pid, channel, payload):
+
+        self._queue.put_nowait(payload)
+
+    async def handle(self, payload: str):
+
+        message = json.loads(payload)
+        sender, sequence, released = message.pop("w"), message.pop("s"), message.pop("x", ())
+
+        if sender == self.worker_id:
+            return
+
+        self.received += 1
+
+        if self._track(sender, sequence, released):
+            await self.flush()
+            return
+
+        handler = self.handlers.get(message.pop("k"))
+        if handler is not None:
+            await handler(self, message)
+
+    def _track(self, sender: str, sequence: int, released=()) -> bool:
+
+        # Commits on one worker can finish out of order, so a skipped number is only a loss once it has been
+        # missing for gap_timeout. Returns True when the gap is already too wide to wait for.
+        state = self._senders.get(sender)
+
+        if state is None:
+            self._senders[sender] = {"high": sequence, "missing": {}}
+            return False
+
+        missing = state["missing"]
+
+        if sequence > state["high"]:
+            if sequence - state["high"] - 1 + len(missing) > MAX_MISSING:
+                state["high"] = sequence
+                missing.clear()
+                return True
+            now = time.monotonic()
+            for skipped in range(state["high"] + 1, sequence):
+                missing[skipped] = now
+            state["high"] = sequence
+        else:
+            missing.pop(sequence, None)
+
+        for number in released:
+            missing.pop(number, None)
+
+        return False
+
+    async def check_gaps(self):
+
+        deadline = time.monotonic() - self.gap_timeout
+        lost = [
+            state for state in self._senders.values()
+            if any(noticed < deadline for noticed in state["missing"].values())
+        ]
+
+        if lost:
+            for state in lost:
+                state["missing"].clear()
+            await self.flush()
+
+    async def flush(self):
+
+        self.flushes += 1
+        logger.warning("Invalidation messages were missed, flushing local caches")
+
+        for action in self.flush_actions:
+            await action(self)
+
+    async def _listen(self, connection):
+
+        last_ping = time.monotonic()
+
+        while not connection.is_closed():
+            # asyncio.timeout rather than wait_for: on 3.11 wait_for can swallow a cancel that lands just as
+            # a message arrives, and stop() would then wait forever.
+            try:
+                async with asyncio.timeout(1.0):
+                    payload = await self._queue.get()
+            except TimeoutError:
+                await self.check_gaps()
+                # An idle socket can die without either side noticing; a ping makes it surface.
+                if time.monotonic() - last_ping > 10:
+                    await connection.execute("SELECT 1")
+                    last_ping = time.monotonic()
+                continue
+
+            try:
+                await self.handle(payload)
+            except Exception as e:
+                logger.exception("Invalidation message %r failed, flushing local caches: %s", payload, e)
+                await self.flush()
+
+    async def _run(self):
+
+        backoff = 0.5
+        first = True
+
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(
+                    host=self.settings.host, port=self.settings.port, user=self.settings.user,
+                    password=self.settings.password, database=self.settings.database,
+                    server_settings={"application_name": f"invalidation-{self.worker_id}"},
+                )
+                await connection.add_listener(self.channel, self._receive)
+                self.connected = True
+                backoff = 0.5
+
+                # Messages sent while this worker was not listening are gone.
+                if not first:
+                    self.reconnects += 1
+                    self._senders.clear()
+                    await self.flush()
+                first = False
+
+                await self._listen(connection)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Invalidation listener lost its connection: %s", e)
+            finally:
+                self.connected = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def start(self):
+
+        if self.enabled and self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+
+        return {
+            "enabled": self.enabled,
+            "connected": self.connected,
+            "worker_id": self.worker_id,
+            "received": self.received,
+            "flushes": self.flushes,
+            "reconnects": self.reconnects,
+        }
+
+
+invalidation_bus = InvalidationBus(
+    db_settings, invalidation_bus_enabled, invalidation_channel, invalidation_gap_timeout, invalidation_max_backoff,
+    session_factory=async_session,
+)
+
+
+@invalidation_bus.on_flush
+async def _flush_local_caches(bus: InvalidationBus):
+
+    # A lost message could have touched anything, so every cache local to this worker starts over.
+    genre_cache.invalidate()
+    author_cache.invalidate()
+    user_cache.invalidate()
+    book_reads.forget()
+    search_reads.forget()
+    if search_cache.enabled:
+        search_cache.bump()
+
+    if search_engine.ready:
+        async with bus.session_factory() as session:
+            await search_engine.build(session)
+
+
+@invalidation_bus.handler("books")
+async def _refresh_books(bus: InvalidationBus, message: dict):
+
+    book_reads.forget()
+    search_reads.forget()
+    if search_cache.enabled:
+        search_cache.bump()
+
+    if search_engine.ready:
+        async with bus.session_factory() as session:
+            await search_engine.refresh(session, message.get("ids"), message.get("range"))
+
+
+@invalidation_bus.handler("user")
+async def _invalidate_user(bus: InvalidationBus, message: dict):
+
+    user_cache.invalidate_user(message["id"])
+
+
+@event.listens_for(Session, "before_commit")
+def _send_invalidations(session):
+
+    for bus, messages in session.info.pop("invalidations", {}).items():
+        bus.send(session, messages)
+
+
+@event.listens_for(Session, "after_commit")
+def _confirm_invalidations(session):
+
+    session.info.pop("invalidation_sequences", None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session):
+
+    session.info.pop("invalidations", None)
+
+    for bus, sequences in session.info.pop("invalidation_sequences", {}).items():
+        bus.release(sequences)
@@ -1,13 +1,97 @@
 import os
 import sys
+import math
+import time
+import logging
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Depends
+from fastapi.responses import PlainTextResponse
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from config.db_config import (async_session, engine, db_settings, warm_pool, get_pool_stats, read_replicas,
+                              PRIMARY_PIN_COOKIE)
 from auth.routers import auth
 from books.routers import books
-app = FastAPI(title="Book systerm")
+from books.jobs import import_pool
+from books.cache import genre_cache
+from books.search_index import search_engine
+from auth.utils import password_executor
+from app.metrics import registry, MetricsMiddleware
+from app.invalidation import invalidation_bus
+from app.utils import get_current_user
+from auth.models import User
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+
+    if db_settings.pool_warmup:
+        try:
+            await warm_pool(engine, db_settings.pool_size)
+        except Exception as e:
+            logger.warning("Connection pool warmup failed: %s", e)
+
+    await read_replicas.start()
+
+    try:
+        async with async_session() as session:
+            await genre_cache.load(session)
+    except Exception as e:
+        logger.warning("Genre cache preload failed, it will be loaded on first use: %s", e)
+
+    if search_engine.enabled:
+        async with async_session() as session:
+            await search_engine.build(session)
+        logger.info("In-memory search index built: %s", search_engine.stats())
+
+    try:
+        interrupted = await import_pool.recover()
+        if interrupted:
+            logger.warning("Marked %s unfinished import jobs as interrupted", interrupted)
+    except Exception as e:
+        logger.warning("Import job recovery failed: %s", e)
+
+    import_pool.start()
+
+    await invalidation_bus.start()
+
+    yield
+
+    await invalidation_bus.stop()
+    await import_pool.stop()
+    await read_replicas.stop()
+    password_executor.shutdown(wait=False)
+
+app = FastAPI(title="Book systerm", lifespan=lifespan)
 
 app.include_router(auth)
-app.include_router(books)
\ No newline at end of file
+app.include_router(books)
+
+@app.middleware("http")
+async def pin_writers_to_primary(request: Request, call_next):
+
+    response = await call_next(request)
+
+    # Read-your-writes: after a successful write the client reads from the primary for a short window.
+    window = db_settings.read_your_writes_seconds
+    if read_replicas.replicas and window > 0 and request.method not in ("GET", "HEAD", "OPTIONS") \
+            and response.status_code < 400:
+        response.set_cookie(PRIMARY_PIN_COOKIE, str(time.time() + window), max_age=math.ceil(window), httponly=True)
+
+    return response
+
+# Added last so it is the outermost middleware and times everything below it.
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/pool-stats")
+async def pool_stats(user: User = Depends(get_current_user)):
+
+    return get_pool_stats()
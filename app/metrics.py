@@ -0,0 +1,333 @@
+import os
+import sys
+import time
+import logging
+
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.db_config import TimedQueuePool, engine, read_replicas
+from config.app_config import request_timing_headers, query_repeat_warn_threshold
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def format_labels(labelnames: tuple, labelvalues: tuple, extra: str = "") -> str:
+
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape(value) -> str:
+
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def header(self) -> list:
+
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+
+        return self._values.get(labelvalues, 0)
+
+    def render(self) -> list:
+
+        return self.header() + [
+            f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+
+    kind = "gauge"
+
+    def dec(self, *labelvalues, amount: float = 1):
+
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, *labelvalues, value: float):
+
+        self._values[labelvalues] = value
+
+
+class Histogram(Metric):
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}
+
+    def observe(self, value: float, *labelvalues):
+
+        # Per-bucket counts are kept non-cumulative so an observation is one bisect and two additions.
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labelvalues) -> int:
+
+        series = self._series.get(labelvalues)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> list:
+
+        lines = self.header()
+
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = format_labels(self.labelnames, labels, f'le="{format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}")
+
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric: Metric) -> Metric:
+
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, function):
+
+        # Collectors refresh gauges that are cheaper to read at scrape time than to track on every change.
+        self._collectors.append(function)
+        return function
+
+    def render(self) -> str:
+
+        for collect in self._collectors:
+            collect()
+
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served."
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Time spent executing SQL statements.", ("statement",)
+))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "SQL statements executed while serving one HTTP request.", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS
+))
+db_pool_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time to check a connection out of the pool."
+))
+db_pool_connections = registry.register(Gauge(
+    "db_pool_connections", "Pool connections by state.", ("pool", "state")
+))
+singleflight_calls = registry.register(Counter(
+    "singleflight_calls_total", "Reads that ran their own query.", ("operation",)
+))
+singleflight_coalesced = registry.register(Counter(
+    "singleflight_coalesced_total", "Reads served by joining an identical read already in flight.", ("operation",)
+))
+
+
+class RequestStats:
+
+    __slots__ = ("method", "path", "queries", "query_seconds", "commits", "statements")
+
+    def __init__(self, method: str = None, path: str = None):
+
+        self.method = method
+        self.path = path
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.commits = 0
+        self.statements = {}
+
+    def record(self, statement: str, elapsed: float):
+
+        self.queries += 1
+        self.query_seconds += elapsed
+
+        # Statements reach the driver with bound parameters, so identical text means an identical shape;
+        # the same shape run over and over in one request is usually a query inside a loop.
+        if query_repeat_warn_threshold:
+            repeats = self.statements[statement] = self.statements.get(statement, 0) + 1
+            if repeats == query_repeat_warn_threshold:
+                logger.warning("Possible N+1: statement ran %d times in %s %s: %s",
+                               repeats, self.method, self.path, " ".join(statement.split())[:300])
+
+    def headers(self, elapsed: float) -> list:
+
+        return [
+            (b"server-timing", (
+                f'db;dur={self.query_seconds * 1000:.2f};desc="{self.queries} queries, {self.commits} commits", '
+                f"app;dur={elapsed * 1000:.2f}"
+            ).encode()),
+            (b"x-db-queries", str(self.queries).encode()),
+            (b"x-db-commits", str(self.commits).encode()),
+        ]
+
+
+# Set by the middleware for the duration of a request; SQLAlchemy runs statements in the same context.
+current_request_stats = ContextVar("current_request_stats", default=None)
+
+
+def statement_kind(statement: str) -> str:
+
+    keyword = statement.lstrip()[:6].upper()
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    db_query_duration.observe(elapsed, statement_kind(statement))
+
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+
+@event.listens_for(Engine, "commit")
+def _count_commit(conn):
+
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.commits += 1
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_statement_timer(exception_context):
+
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+
+TimedQueuePool.observers.append(db_pool_wait.observe)
+
+
+@registry.collector
+def _collect_pool_connections():
+
+    pools = [("primary", engine.pool)] + [(replica.name, replica.engine.pool) for replica in read_replicas.replicas]
+    for name, pool in pools:
+        db_pool_connections.set(name, "checked_out", value=pool.checkedout())
+        db_pool_connections.set(name, "checked_in", value=pool.checkedin())
+        db_pool_connections.set(name, "overflow", value=max(0, pool.overflow()))
+
+
+class MetricsMiddleware:
+
+    # Plain ASGI middleware: it adds no task or body buffering, unlike BaseHTTPMiddleware.
+    def __init__(self, app):
+
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+        stats = RequestStats(scope["method"], scope["path"])
+        token = current_request_stats.set(stats)
+        http_requests_in_flight.inc()
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                # Counts cover the work done before the response started; a streamed body can add more.
+                if request_timing_headers:
+                    message = {**message, "headers": [
+                        *message.get("headers", []), *stats.headers(time.perf_counter() - start)
+                    ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            current_request_stats.reset(token)
+
+            # The router stores the matched route in the scope; unmatched paths share one label.
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+
+            http_requests.inc(method, route, str(status[0]))
+            http_request_duration.observe(time.perf_counter() - start, method, route)
+            db_queries_per_request.observe(stats.queries, method, route)
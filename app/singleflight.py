@@ -0,0 +1,88 @@
+import os
+import sys
+import asyncio
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.metrics import singleflight_calls, singleflight_coalesced
+
+
+class SingleFlight:
+
+    # Identical reads that arrive while one is already running wait for its result instead of taking
+    # a connection of their own.
+    def __init__(self, name: str):
+
+        self.name = name
+        self._calls = {}
+
+    async def do(self, session: AsyncSession, key, function):
+
+        # Reads are shared only between sessions on the same engine, so a client pinned to the primary
+        # never gets a result read from a replica.
+        key = (id(session.bind), key)
+        future = self._calls.get(key)
+
+        if future is not None:
+            singleflight_coalesced.inc(self.name)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The caller that ran the query was cancelled, not this one: run it again.
+                if not future.cancelled():
+                    raise
+                return await self.do(session, key[1], function)
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        singleflight_calls.inc(self.name)
+
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def forget(self):
+
+        # Waiters already attached still get their result; later callers start a fresh read.
+        self._calls.clear()
+
+    def stage(self, session: AsyncSession):
+
+        session.sync_session.info.setdefault("singleflight_writes", set()).add(self)
+
+    def stats(self) -> dict:
+
+        return {
+            "in_flight": len(self._calls),
+            "calls": singleflight_calls.value(self.name),
+            "coalesced": singleflight_coalesced.value(self.name),
+        }
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_reads_before_commit(session):
+
+    # A read started before this commit may not see it, so nobody arriving after the commit may join it.
+    for flights in session.info.pop("singleflight_writes", ()):
+        flights.forget()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_singleflight_writes(session):
+
+    session.info.pop("singleflight_writes", None)
@@ -11,6 +11,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from config.db_config import get_session
 from config.app_config import jwt_secret, jwt_algorithm
 from auth.models import User
+from auth.cache import user_cache
 
 async def get_current_user(request: Request, session: AsyncSession = Depends(get_session)):
 
@@ -19,6 +20,11 @@ async def get_current_user(request: Request, session: AsyncSession = Depends(get
     if not token:
         raise HTTPException(status_code=401, detail="Token is missing in cookies")
 
+    user = user_cache.get(token)
+
+    if user is not None:
+        return user
+
     try:
 
         payload = jwt.decode(token, jwt_secret, algorithms=[jwt_algorithm])
@@ -27,13 +33,21 @@ async def get_current_user(request: Request, session: AsyncSession = Depends(get
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        query = select(User).where(User.c.email == email)
+        # Tokens issued before the uid claim existed still resolve by email.
+        user_id = payload.get("uid")
+        if user_id is not None:
+            query = select(User).where(User.c.id == user_id, User.c.email == email)
+        else:
+            query = select(User).where(User.c.email == email)
+
         user = await session.execute(query)
         user = user.fetchone()
 
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
 
+        user_cache.put(token, user, payload.get("exp"))
+
         return user
 
     except jwt.PyJWTError:
@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+
+from collections import OrderedDict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.app_config import user_cache_ttl, user_cache_size
+
+
+class UserCache:
+
+    # Maps a token to the user row it resolved to, so most authenticated requests skip the JWT decode and the query.
+    def __init__(self, ttl: float, max_size: int):
+
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._users = OrderedDict()
+        self._tokens = {}
+
+    def get(self, token: str):
+
+        entry = self._users.get(token)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        user, expires_at = entry
+
+        if time.monotonic() >= expires_at:
+            self._drop(token)
+            self.misses += 1
+            return None
+
+        self._users.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def put(self, token: str, user, token_expires_at: float = None):
+
+        ttl = self.ttl
+        # An entry never outlives the token's own exp claim.
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+
+        self._drop(token)
+        self._users[token] = (user, time.monotonic() + ttl)
+        self._tokens.setdefault(user.id, set()).add(token)
+
+        while len(self._users) > self.max_size:
+            self._drop(next(iter(self._users)))
+
+    def _drop(self, token: str):
+
+        entry = self._users.pop(token, None)
+
+        if entry is not None:
+            tokens = self._tokens.get(entry[0].id)
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens[entry[0].id]
+
+    def invalidate_user(self, user_id: int):
+
+        for token in self._tokens.pop(user_id, set()):
+            self._users.pop(token, None)
+
+    def invalidate(self):
+
+        self._users.clear()
+        self._tokens.clear()
+
+    def stats(self) -> dict:
+
+        return {
+            "size": len(self._users),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "ttl": self.ttl,
+        }
+
+
+user_cache = UserCache(user_cache_ttl, user_cache_size)
+
+
+def invalidate_user(user_id: int):
+
+    user_cache.invalidate_user(user_id)
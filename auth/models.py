@@ -3,7 +3,7 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from sqlalchemy import Table, Column, String, ForeignKey, BigInteger, TIMESTAMP, func
+from sqlalchemy import Table, Column, String, ForeignKey, BigInteger, TIMESTAMP, Index, func
 from config.db_config import metaData
 
 User = Table(
@@ -11,7 +11,7 @@ User = Table(
     "User",
     metaData,
     Column("id", BigInteger, primary_key=True, autoincrement=True),
-    Column("email", String, nullable=False),
+    Column("email", String, nullable=False, unique=True, index=True),
     Column("password", String, nullable=False),
     Column("createAt", TIMESTAMP, nullable=False, default=func.now()),
 
@@ -22,5 +22,6 @@ UserBooks = Table(
     metaData,
     Column("id", BigInteger, primary_key=True, autoincrement=True),
     Column("user_id", BigInteger, ForeignKey("User.id")),
-    Column("book_id", BigInteger, ForeignKey("Book.id"))
+    Column("book_id", BigInteger, ForeignKey("Book.id")),
+    Index("ix_UserBooksMerge_book_id_user_id", "book_id", "user_id"),
 )
\ No newline at end of file
@@ -1,26 +1,75 @@
 import os
 import sys
 
+import asyncio
 import bcrypt
 import jwt
 import re
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status, Response
-from sqlalchemy import insert, select
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from config.app_config import jwt_secret, jwt_algorithm
+from config.app_config import jwt_secret, jwt_algorithm, bcrypt_rounds, password_hash_concurrency
 from auth.schemas import UserCreate
 from auth.models import User
+from auth.cache import invalidate_user
+from app.invalidation import invalidation_bus
+
+class PasswordExecutor:
+
+    # bcrypt releases the GIL, so a few threads keep hashing off the event loop and cap how many run at once.
+    # The pool is built on first use and again after a shutdown, so a later lifespan in the same process works.
+    def __init__(self, max_workers: int):
+
+        self.max_workers = max_workers
+        self._executor = None
+
+    def get(self) -> ThreadPoolExecutor:
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def shutdown(self, wait: bool = False):
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+password_executor = PasswordExecutor(password_hash_concurrency)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
 
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor.get(), verify_password, plain_password, hashed_password)
+
+
+async def hash_password(password: str) -> str:
+
+    loop = asyncio.get_running_loop()
+    hashed = await loop.run_in_executor(password_executor.get(), bcrypt.hashpw, password.encode('utf-8'),
+                                        bcrypt.gensalt(bcrypt_rounds))
+    return hashed.decode('utf-8')
+
+
+def password_cost(hashed_password: str) -> int:
+
+    # "$2b$12$<salt+hash>" -> 12
+    return int(hashed_password.split("$")[2])
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -49,11 +98,16 @@ async def register_user(session: AsyncSession, user: UserCreate):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Password must be at least 8 characters long and contain no special characters.")
 
-    hashed_password = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed_password = await hash_password(user.password)
 
     new_user = insert(User).values(email=user.email, password=hashed_password)
-    await session.execute(new_user)
-    await session.commit()
+
+    try:
+        await session.execute(new_user)
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User with this email already exists")
 
     return {"message": "User registered successfully"}
 
@@ -64,11 +118,19 @@ async def authenticate_user(session: AsyncSession, email: str, password: str, re
     result = await session.execute(query)
     user = result.fetchone()
 
-    if user is None or not verify_password(password, user.password):
+    if user is None or not await check_password(password, user.password):
 
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    access_token = create_access_token(data={"sub": user.email})
+    # Hashes made under a different BCRYPT_ROUNDS are upgraded while the plain password is at hand.
+    if password_cost(user.password) != bcrypt_rounds:
+        new_hash = update(User).where(User.c.id == user.id).values(password=await hash_password(password))
+        await session.execute(new_hash)
+        invalidation_bus.publish(session, "user", id=user.id)
+        await session.commit()
+        invalidate_user(user.id)
+
+    access_token = create_access_token(data={"sub": user.email, "uid": user.id})
 
     response.set_cookie(
         key="access_token",
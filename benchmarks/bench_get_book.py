@@ -0,0 +1,63 @@
+import os
+import sys
+import argparse
+import asyncio
+
+from sqlalchemy import select, func
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.db_config import engine, async_session
+from books.models import Book, Genres, Authors
+from books.utils import get_books
+from benchmarks.common import run_concurrently, summarize, print_table
+
+
+async def get_books_three_queries(session, bookID: int):
+
+    # The pre-join implementation: Book row, then Genres, then Authors.
+    result = await session.execute(select(Book).where(Book.c.id == bookID))
+    book = result.fetchone()
+    book_data = {column: value for column, value in zip(result.keys(), book)}
+
+    result = await session.execute(select(Genres).where(Genres.c.id == book_data["genre"]))
+    book_data["genre"] = result.fetchone().genre_name
+
+    result = await session.execute(select(Authors).where(Authors.c.id == book_data["author"]))
+    author = result.fetchone()
+    book_data["author"] = f"{author.author_lastName} {author.author_firstName}"
+
+    return {"message": "success", "data": book_data}
+
+
+async def main(requests: int, concurrency: int):
+
+    async with async_session() as session:
+        result = await session.execute(select(Book.c.id).order_by(func.random()).limit(1000))
+        book_ids = result.scalars().all()
+
+    if not book_ids:
+        raise SystemExit("The Book table is empty, seed it first")
+
+    results = []
+    for name, fetch in (("three_queries", get_books_three_queries), ("joined_query", get_books)):
+
+        async def operation(i):
+            async with async_session() as session:
+                await fetch(session, book_ids[i % len(book_ids)])
+
+        latencies, elapsed = await run_concurrently(operation, requests, concurrency)
+        results.append(summarize(name, latencies, elapsed))
+
+    print_table(results)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare GET /books/bookID={bookID} query strategies")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.requests, args.concurrency))
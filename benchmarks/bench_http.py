@@ -0,0 +1,266 @@
+import os
+import sys
+import argparse
+import asyncio
+import csv
+import io
+import json
+import platform
+import random
+import subprocess
+
+from datetime import datetime, timezone
+
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import select, func
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.db_config import engine, async_session
+from auth.models import User, UserBooks
+from books.models import Book, Authors
+from app.main import app
+from benchmarks.common import run_concurrently, summarize, print_table, find_regressions
+from benchmarks.generate import WORDS, GENRES, USER_PASSWORD, author_name, generate_book, user_email
+
+SCENARIOS = {}
+LATENCY_METRICS = ["mean_ms", "p50_ms", "p95_ms", "p99_ms"]
+
+
+def scenario(name: str, requests_arg: str = "requests", concurrency_arg: str = "concurrency"):
+
+    def register(function):
+        SCENARIOS[name] = (function, requests_arg, concurrency_arg)
+        return function
+
+    return register
+
+
+class Workload:
+
+    # State shared by the scenarios: the seeded catalog's shape and the bench user's own books.
+    def __init__(self, client: AsyncClient, login_client: AsyncClient, seed: int):
+
+        self.client = client
+        self.login_client = login_client
+        self.rng = random.Random(seed)
+        self.max_book_id = 0
+        self.authors = 0
+        self.users = 0
+        self.owned_ids = []
+        self.created_ids = []
+
+    async def load(self, user_id: int):
+
+        async with async_session() as session:
+            self.max_book_id = await session.scalar(select(func.max(Book.c.id))) or 0
+            self.authors = await session.scalar(select(func.count()).select_from(Authors))
+            self.users = await session.scalar(
+                select(func.count()).select_from(User).where(User.c.email.like(user_email("%")))
+            )
+            result = await session.execute(
+                select(UserBooks.c.book_id).where(UserBooks.c.user_id == user_id).limit(10000)
+            )
+            self.owned_ids = result.scalars().all()
+
+        if not self.max_book_id or not self.owned_ids:
+            raise SystemExit("The catalog is empty, seed it first with python -m benchmarks.generate")
+
+    def search_params(self) -> dict:
+
+        kind = self.rng.randrange(5)
+
+        if kind == 0:
+            return {"title": self.rng.choice(WORDS)}
+        if kind == 1:
+            return {"author_lastName": author_name(self.rng.randint(1, self.authors))[1]}
+        if kind == 2:
+            return {"genre": self.rng.choice(GENRES), "published_years": self.rng.randint(1800, 2024)}
+        if kind == 3:
+            return {"isbn": f"978{self.rng.randrange(1000):03d}"}
+        return {"title": self.rng.choice(WORDS), "pagination": "cursor", "limit": 20}
+
+    def books_csv(self, rows: int) -> bytes:
+
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["Title", "Author", "Genre", "Pages", "Publisher", "Year", "Language", "ISBN"])
+        for _ in range(rows):
+            book = generate_book(self.rng, self.rng.randint(1, self.authors))
+            writer.writerow([
+                book["title"], f"{book['author']['author_firstName']} {book['author']['author_lastName']}",
+                book["genre"], book["pages"], book["publisher"], book["published_years"], book["language"],
+                book["isbn"],
+            ])
+        return output.getvalue().encode()
+
+
+def expect(response, *statuses):
+
+    if response.status_code not in statuses:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: "
+                           f"{response.status_code} {response.text[:200]}")
+
+
+@scenario("get_by_id")
+async def get_by_id(workload: Workload, i: int):
+
+    response = await workload.client.get(f"/books/bookID={workload.rng.randint(1, workload.max_book_id)}")
+    expect(response, 200, 404)
+
+
+@scenario("get_hot")
+async def get_hot(workload: Workload, i: int):
+
+    # Every request goes to one of three books, like a link that is being shared widely.
+    response = await workload.client.get(f"/books/bookID={workload.owned_ids[i % 3]}")
+    expect(response, 200)
+
+
+@scenario("search_mixed")
+async def search_mixed(workload: Workload, i: int):
+
+    response = await workload.client.get("/books/search", params=workload.search_params())
+    expect(response, 200)
+
+
+@scenario("create")
+async def create(workload: Workload, i: int):
+
+    book = generate_book(workload.rng, workload.rng.randint(1, workload.authors))
+    response = await workload.client.post("/books/create", json=book)
+    expect(response, 200)
+    workload.created_ids.append(response.json()["book_id"])
+
+
+@scenario("update")
+async def update(workload: Workload, i: int):
+
+    book_id = workload.owned_ids[i % len(workload.owned_ids)]
+    changes = {"pages": workload.rng.randint(50, 1200), "published_years": workload.rng.randint(1800, 2024)}
+    response = await workload.client.patch(f"/books/books/{book_id}", json=changes)
+    expect(response, 200)
+
+
+@scenario("delete")
+async def delete(workload: Workload, i: int):
+
+    # Deletes the books the create scenario made, so the seeded catalog keeps its shape between runs.
+    if not workload.created_ids:
+        return
+    response = await workload.client.delete(f"/books/delete={workload.created_ids.pop()}")
+    expect(response, 200)
+
+
+@scenario("login", "login_requests", "login_concurrency")
+async def login(workload: Workload, i: int):
+
+    credentials = {"email": user_email(i % workload.users + 1), "password": USER_PASSWORD}
+    response = await workload.login_client.post("/auth/login", json=credentials)
+    expect(response, 200)
+
+
+def bulk_import_scenario(rows: int):
+
+    async def bulk_import(workload: Workload, i: int):
+        files = {"file": (f"bench-{rows}.csv", workload.books_csv(rows), "text/csv")}
+        response = await workload.client.post("/books/bulk-import-books", files=files)
+        expect(response, 200)
+
+    return bulk_import
+
+
+def git_commit() -> str:
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+
+    for rows in args.import_sizes:
+        scenario(f"bulk_import_{rows}", "import_repeats", "import_concurrency")(bulk_import_scenario(rows))
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = set(names) - SCENARIOS.keys()
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}; available: {', '.join(SCENARIOS)}")
+
+    transport = ASGITransport(app=app)
+    results = []
+
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(transport=transport, base_url="http://bench") as client, \
+                AsyncClient(transport=transport, base_url="http://bench") as login_client:
+
+            response = await client.post("/auth/login", json={"email": user_email(1), "password": USER_PASSWORD})
+            expect(response, 200)
+
+            workload = Workload(client, login_client, args.seed)
+            await workload.load(user_id=1)
+
+            for name in names:
+                operation, requests_arg, concurrency_arg = SCENARIOS[name]
+                requests = getattr(args, requests_arg)
+                if name == "delete":
+                    requests = min(requests, len(workload.created_ids))
+
+                latencies, elapsed = await run_concurrently(
+                    lambda i: operation(workload, i), requests, getattr(args, concurrency_arg)
+                )
+                results.append(summarize(name, latencies, elapsed))
+
+    await engine.dispose()
+
+    run = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "catalog": {"max_book_id": workload.max_book_id, "authors": workload.authors, "users": workload.users},
+            "args": {key: value for key, value in vars(args).items() if key not in ("baseline", "output")},
+        },
+        "results": results,
+    }
+
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(run, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = find_regressions(baseline, run, args.metric, args.threshold)
+        if regressions:
+            for name, before, after, change in regressions:
+                print(f"REGRESSION {name}: {args.metric} {before} -> {after} ({change:+.1%})")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run HTTP workloads against app.main:app on a seeded catalog")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=None,
+                        help="comma-separated subset of scenarios, in the order to run them")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--login-requests", type=int, default=100)
+    parser.add_argument("--login-concurrency", type=int, default=8)
+    parser.add_argument("--import-sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=[100, 1000, 10000])
+    parser.add_argument("--import-repeats", type=int, default=3)
+    parser.add_argument("--import-concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the run as JSON to this path")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--metric", choices=LATENCY_METRICS, default="p95_ms")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="fail when a scenario's metric grows by more than this fraction of the baseline")
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
@@ -0,0 +1,66 @@
+import os
+import sys
+import argparse
+import asyncio
+
+from httpx import AsyncClient, ASGITransport
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import auth.utils
+from config.db_config import engine
+from app.main import app
+from benchmarks.common import run_concurrently, summarize, print_table
+
+CREDENTIALS = {"email": "bench-login@example.com", "password": "benchpassword1"}
+
+
+async def check_password_on_loop(plain_password: str, hashed_password: str) -> bool:
+
+    # The pre-executor behaviour, for comparison: bcrypt runs on the event loop thread.
+    return auth.utils.verify_password(plain_password, hashed_password)
+
+
+async def main(searches: int, logins: int, concurrency: int, login_concurrency: int, blocking: bool):
+
+    if blocking:
+        auth.utils.check_password = check_password_on_loop
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver") as client:
+        await client.post("/auth/register", json={**CREDENTIALS, "confirmPassword": CREDENTIALS["password"]})
+
+        async def search(i):
+            response = await client.get("/books/search", params={"title": "a", "offset": i % 50})
+            response.raise_for_status()
+
+        async def login(i):
+            response = await client.post("/auth/login", json=CREDENTIALS)
+            response.raise_for_status()
+
+        results = []
+
+        latencies, elapsed = await run_concurrently(search, searches, concurrency)
+        results.append(summarize("search_idle", latencies, elapsed))
+
+        (latencies, elapsed), (login_latencies, login_elapsed) = await asyncio.gather(
+            run_concurrently(search, searches, concurrency),
+            run_concurrently(login, logins, login_concurrency),
+        )
+        results.append(summarize("search_storm", latencies, elapsed))
+        results.append(summarize("login_storm", login_latencies, login_elapsed))
+
+    print_table(results)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="/books/search latency while a burst of logins runs")
+    parser.add_argument("--searches", type=int, default=2000)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--login-concurrency", type=int, default=20)
+    parser.add_argument("--blocking", action="store_true", help="verify passwords on the event loop, as before")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.searches, args.logins, args.concurrency, args.login_concurrency, args.blocking))
@@ -0,0 +1,88 @@
+import os
+import sys
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from books.schemas import BookSearch
+from books.search_index import InvertedIndex
+from benchmarks.common import summarize, print_table
+from benchmarks.generate import WORDS, GENRES, LANGUAGES
+
+
+def generate_books(count: int, seed: int = 42):
+
+    rng = random.Random(seed)
+    authors = [(f"First{number}", f"Last{number}") for number in range(max(1, count // 10))]
+
+    for book_id in range(1, count + 1):
+        first_name, last_name = rng.choice(authors)
+        yield {
+            "id": book_id,
+            "title": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title(),
+            "published_years": rng.randint(1800, 2024),
+            "isbn": f"978{rng.randrange(10 ** 10):010d}",
+            "pages": rng.randint(50, 1200),
+            "publisher": f"Publisher {rng.randint(1, 500)}",
+            "language": rng.choice(LANGUAGES),
+            "author_firstName": first_name,
+            "author_lastName": last_name,
+            "genre_name": rng.choice(GENRES),
+        }
+
+
+def main(books: int, queries: int):
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    index = InvertedIndex()
+    start = time.perf_counter()
+    for book in generate_books(books):
+        index.upsert(book)
+    build_seconds = time.perf_counter() - start
+
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"books: {books}, build: {build_seconds:.1f}s, memory: {used / 2 ** 20:.1f} MiB, "
+          f"{used / books:.0f} bytes/book")
+    print(index.stats())
+
+    rng = random.Random(7)
+    scenarios = {
+        "title_word": lambda: BookSearch(title=rng.choice(WORDS)),
+        "title_two_words": lambda: BookSearch(title=f"{rng.choice(WORDS)} {rng.choice(WORDS)}"),
+        "author_last": lambda: BookSearch(author_lastName=f"Last{rng.randrange(books // 10)}"),
+        "genre_year": lambda: BookSearch(genre=rng.choice(GENRES), published_years=rng.randint(1800, 2024)),
+        "isbn_prefix": lambda: BookSearch(isbn=f"978{rng.randrange(1000):03d}"),
+        "no_filters_deep": lambda: BookSearch(),
+    }
+
+    results = []
+    for name, make_query in scenarios.items():
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(queries):
+            search_data = make_query()
+            query_start = time.perf_counter()
+            index.search(search_data, 20, offset=rng.randrange(100))
+            latencies.append(time.perf_counter() - query_start)
+        results.append(summarize(name, latencies, time.perf_counter() - start))
+
+    print_table(results)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Measure memory and latency of the in-memory search index")
+    parser.add_argument("--books", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    main(args.books, args.queries)
@@ -0,0 +1,70 @@
+import asyncio
+import statistics
+import time
+
+
+def percentile(samples: list, percent: float) -> float:
+
+    if not samples:
+        return 0.0
+
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(name: str, latencies: list, elapsed: float) -> dict:
+
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def run_concurrently(operation, requests: int, concurrency: int) -> tuple:
+
+    # Runs `requests` calls of operation(i) with at most `concurrency` in flight; returns (latencies, elapsed).
+    latencies = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            await operation(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return latencies, time.perf_counter() - start
+
+
+def print_table(results: list):
+
+    columns = ["scenario", "requests", "rps", "p50_ms", "p95_ms", "p99_ms"]
+    print(" | ".join(f"{column:>14}" for column in columns))
+    for result in results:
+        print(" | ".join(f"{str(result[column]):>14}" for column in columns))
+
+
+def find_regressions(baseline: dict, current: dict, metric: str, threshold: float) -> list:
+
+    # Compares scenarios present in both runs; a scenario regresses when metric grew by more than threshold.
+    previous = {result["scenario"]: result for result in baseline["results"]}
+    regressions = []
+
+    for result in current["results"]:
+        before = previous.get(result["scenario"])
+        if before is None or not before[metric]:
+            continue
+        change = result[metric] / before[metric] - 1
+        print(f"{result['scenario']:>20} {metric}: {before[metric]:>10} -> {result[metric]:>10} ({change:+.1%})")
+        if change > threshold:
+            regressions.append((result["scenario"], before[metric], result[metric], change))
+
+    return regressions
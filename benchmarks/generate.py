@@ -0,0 +1,167 @@
+import os
+import sys
+import argparse
+import asyncio
+import random
+import time
+
+from datetime import datetime
+
+import asyncpg
+import bcrypt
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.db_config import db_settings
+from config.app_config import bcrypt_rounds
+
+WORDS = [
+    "shadow", "river", "king", "garden", "night", "silver", "house", "war", "secret", "winter", "city", "blood",
+    "ocean", "dream", "fire", "stone", "glass", "empire", "storm", "song", "child", "road", "iron", "moon",
+]
+GENRES = [f"Genre {number}" for number in range(40)]
+LANGUAGES = ["English", "French", "German", "Spanish", "Italian"]
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+    "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+]
+
+USER_PASSWORD = "benchpassword1"
+CHUNK_SIZE = 100000
+
+
+def user_email(user_id: int) -> str:
+
+    return f"bench-user-{user_id}@example.com"
+
+
+def catalog_sizes(books: int) -> dict:
+
+    return {
+        "books": books,
+        "authors": max(1, books // 10),
+        "genres": len(GENRES),
+        "users": max(10, books // 1000),
+    }
+
+
+def author_name(author_id: int) -> tuple:
+
+    # (first, last) pairs are unique per id: the first name cycles fastest, the last name and its suffix after it.
+    index = author_id - 1
+    first_name = FIRST_NAMES[index % len(FIRST_NAMES)]
+    rest = index // len(FIRST_NAMES)
+    last_name = LAST_NAMES[rest % len(LAST_NAMES)]
+    suffix = rest // len(LAST_NAMES)
+    return first_name, f"{last_name}{suffix}" if suffix else last_name
+
+
+def generate_book(rng: random.Random, author_id: int) -> dict:
+
+    first_name, last_name = author_name(author_id)
+    return {
+        "title": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title(),
+        "author": {"author_firstName": first_name, "author_lastName": last_name},
+        "genre": rng.choice(GENRES),
+        "pages": rng.randint(50, 1200),
+        "publisher": f"Publisher {rng.randint(1, 500)}",
+        "published_years": rng.randint(1800, 2024),
+        "language": rng.choice(LANGUAGES),
+        "isbn": f"978{rng.randrange(10 ** 10):010d}",
+    }
+
+
+def book_records(start: int, stop: int, authors: int, seed: int):
+
+    # Every chunk has its own generator state, so a chunk can be rebuilt without replaying the ones before it.
+    rng = random.Random(f"{seed}:{start}")
+    for book_id in range(start, stop):
+        author_id = rng.randint(1, authors)
+        book = generate_book(rng, author_id)
+        yield (
+            book_id, book["title"], author_id, book["pages"], GENRES.index(book["genre"]) + 1, book["publisher"],
+            book["published_years"], book["language"], book["isbn"],
+        )
+
+
+async def copy_chunks(connection, table: str, columns: list, total: int, make_records):
+
+    for start in range(1, total + 1, CHUNK_SIZE):
+        stop = min(total + 1, start + CHUNK_SIZE)
+        await connection.copy_records_to_table(table, records=make_records(start, stop), columns=columns)
+
+
+async def seed(books: int, seed_value: int, truncate: bool, rounds: int):
+
+    sizes = catalog_sizes(books)
+    connection = await asyncpg.connect(
+        host=db_settings.host, port=db_settings.port, user=db_settings.user, password=db_settings.password,
+        database=db_settings.database,
+    )
+
+    try:
+        if truncate:
+            await connection.execute(
+                'TRUNCATE "ImportRejects", "ImportJobs", "UserBooksMerge", "Book", "Authors", "Genres", "User" '
+                'RESTART IDENTITY CASCADE'
+            )
+        elif await connection.fetchval('SELECT EXISTS (SELECT 1 FROM "Book")'):
+            raise SystemExit("The catalog is not empty; pass --truncate to replace it")
+
+        password = bcrypt.hashpw(USER_PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+        created_at = datetime.utcnow()
+        start = time.perf_counter()
+
+        async with connection.transaction():
+            await connection.copy_records_to_table(
+                "Genres", records=[(index + 1, name) for index, name in enumerate(GENRES)],
+                columns=["id", "genre_name"],
+            )
+            await copy_chunks(
+                connection, "Authors", ["id", "author_firstName", "author_lastName"], sizes["authors"],
+                lambda start, stop: ((author_id, *author_name(author_id)) for author_id in range(start, stop)),
+            )
+            await copy_chunks(
+                connection, "User", ["id", "email", "password", "createAt"], sizes["users"],
+                lambda start, stop: ((user_id, user_email(user_id), password, created_at)
+                                     for user_id in range(start, stop)),
+            )
+            await copy_chunks(
+                connection, "Book",
+                ["id", "title", "author", "pages", "genre", "publisher", "published_years", "language", "isbn"],
+                sizes["books"], lambda start, stop: book_records(start, stop, sizes["authors"], seed_value),
+            )
+            await copy_chunks(
+                connection, "UserBooksMerge", ["id", "user_id", "book_id"], sizes["books"],
+                lambda start, stop: ((book_id, (book_id - 1) % sizes["users"] + 1, book_id)
+                                     for book_id in range(start, stop)),
+            )
+
+            for table in ("Genres", "Authors", "User", "Book", "UserBooksMerge"):
+                await connection.execute(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                    f"(SELECT coalesce(max(id), 0) + 1 FROM \"{table}\"), false)"
+                )
+
+        await connection.execute("ANALYZE")
+        print(f"seeded {sizes} in {time.perf_counter() - start:.1f}s")
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Seed a deterministic synthetic catalog into the configured database")
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="replace the existing catalog")
+    parser.add_argument("--bcrypt-rounds", type=int, default=bcrypt_rounds,
+                        help="cost of the shared bench user password hash; defaults to BCRYPT_ROUNDS")
+    args = parser.parse_args()
+
+    asyncio.run(seed(args.books, args.seed, args.truncate, args.bcrypt_rounds))
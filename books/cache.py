@@ -0,0 +1,180 @@
+import os
+import sys
+import time
+
+from collections import OrderedDict
+
+from sqlalchemy import select, tuple_, event
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.app_config import genre_cache_ttl, author_cache_size
+from books.models import Genres, Authors
+from app.singleflight import SingleFlight
+
+
+class GenreCache:
+
+    def __init__(self, ttl: float):
+
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._ids = {}
+        self._loaded_at = None
+
+    async def load(self, session: AsyncSession):
+
+        result = await session.execute(select(Genres.c.genre_name, Genres.c.id))
+        self._ids = {row.genre_name: row.id for row in result}
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+
+        self._loaded_at = None
+
+    async def get_ids(self, session: AsyncSession, genre_names: set) -> dict:
+
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            await self.load(session)
+
+        genres = {name: self._ids[name] for name in genre_names if name in self._ids}
+        missing = genre_names - genres.keys()
+
+        self.hits += len(genres)
+        self.misses += len(missing)
+
+        # A genre added since the last refresh is picked up here instead of waiting for the TTL.
+        if missing:
+            query = select(Genres.c.genre_name, Genres.c.id).where(Genres.c.genre_name.in_(missing))
+            result = await session.execute(query)
+            for row in result:
+                self._ids[row.genre_name] = row.id
+                genres[row.genre_name] = row.id
+
+        return genres
+
+    async def get_id(self, session: AsyncSession, genre_name: str):
+
+        genres = await self.get_ids(session, {genre_name})
+        return genres.get(genre_name)
+
+    def stats(self) -> dict:
+
+        return {
+            "size": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "ttl": self.ttl,
+            "age": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None,
+        }
+
+
+class AuthorCache:
+
+    def __init__(self, max_size: int):
+
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._ids = OrderedDict()
+
+    def put(self, author_name: tuple, author_id: int):
+
+        self._ids[author_name] = author_id
+        self._ids.move_to_end(author_name)
+
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+    def put_after_commit(self, session: AsyncSession, author_name: tuple, author_id: int):
+
+        # Authors inserted in an open transaction only become visible to the cache once it commits.
+        session.sync_session.info.setdefault("pending_authors", {})[author_name] = author_id
+
+    def invalidate(self):
+
+        self._ids.clear()
+
+    def peek(self, author_name: tuple):
+
+        # Cache-only lookup for callers that upsert on a miss instead of querying.
+        author_id = self._ids.get(author_name)
+
+        if author_id is None:
+            self.misses += 1
+        else:
+            self._ids.move_to_end(author_name)
+            self.hits += 1
+
+        return author_id
+
+    async def get_ids(self, session: AsyncSession, author_names: set) -> dict:
+
+        authors = {}
+        for author_name in author_names:
+            author_id = self._ids.get(author_name)
+            if author_id is not None:
+                self._ids.move_to_end(author_name)
+                authors[author_name] = author_id
+
+        missing = author_names - authors.keys()
+
+        self.hits += len(authors)
+        self.misses += len(missing)
+
+        if missing:
+            query = select(Authors.c.author_firstName, Authors.c.author_lastName, Authors.c.id).where(
+                tuple_(Authors.c.author_firstName, Authors.c.author_lastName).in_(missing)
+            )
+            result = await session.execute(query)
+            for row in result:
+                author_name = (row.author_firstName, row.author_lastName)
+                self.put(author_name, row.id)
+                authors[author_name] = row.id
+
+        return authors
+
+    async def get_id(self, session: AsyncSession, author_name: tuple):
+
+        authors = await self.get_ids(session, {author_name})
+        return authors.get(author_name)
+
+    def stats(self) -> dict:
+
+        return {
+            "size": len(self._ids),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+genre_cache = GenreCache(genre_cache_ttl)
+author_cache = AuthorCache(author_cache_size)
+book_reads = SingleFlight("get_book")
+search_reads = SingleFlight("search_book")
+
+
+@event.listens_for(Session, "after_commit")
+def _write_through_authors(session):
+
+    for author_name, author_id in session.info.pop("pending_authors", {}).items():
+        author_cache.put(author_name, author_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_authors(session):
+
+    session.info.pop("pending_authors", None)
+
+
+def get_cache_stats() -> dict:
+
+    return {
+        "genres": genre_cache.stats(),
+        "authors": author_cache.stats(),
+        "singleflight": {"get_book": book_reads.stats(), "search_book": search_reads.stats()},
+    }
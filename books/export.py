@@ -0,0 +1,90 @@
+import os
+import sys
+import csv
+import io
+import json
+import zlib
+
+from typing import AsyncIterator
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.app_config import export_batch_size
+from books.models import Book
+from books.schemas import BookSearch
+from books.utils import search_query
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "json": ("application/json", "json"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+EXPORT_COLUMNS = [
+    "id", "title", "author_firstName", "author_lastName", "genre_name", "pages", "publisher", "published_years",
+    "language", "isbn",
+]
+
+
+def format_csv(rows: list, header: bool = False) -> str:
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([row[column] for column in EXPORT_COLUMNS] for row in rows)
+    return output.getvalue()
+
+
+def format_json(rows: list, first: bool) -> str:
+
+    # Objects are joined by hand so the array is never held whole; the brackets come from export_books.
+    objects = ",\n".join(json.dumps({column: row[column] for column in EXPORT_COLUMNS}) for row in rows)
+    return objects if first or not objects else ",\n" + objects
+
+
+def format_ndjson(rows: list) -> str:
+
+    return "".join(json.dumps({column: row[column] for column in EXPORT_COLUMNS}) + "\n" for row in rows)
+
+
+async def export_books(session_factory, search_data: BookSearch, export_format: str, compress: bool = False,
+                       batch_size: int = export_batch_size) -> AsyncIterator[bytes]:
+
+    # The body outlives the request's dependencies, so the generator opens its own session. yield_per makes
+    # session.stream use a server-side cursor: one batch of rows is in memory at a time, here and in the DB.
+    query = search_query(search_data).order_by(Book.c.id).execution_options(yield_per=batch_size)
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor is not None else data
+
+    async with session_factory() as session:
+        result = await session.stream(query)
+        first = True
+
+        if export_format == "json":
+            yield encode("[\n")
+
+        async for rows in result.mappings().partitions():
+            if export_format == "csv":
+                chunk = format_csv(rows, header=first)
+            elif export_format == "json":
+                chunk = format_json(rows, first)
+            else:
+                chunk = format_ndjson(rows)
+            first = False
+
+            data = encode(chunk)
+            if data:
+                yield data
+
+        if export_format == "csv" and first:
+            yield encode(format_csv([], header=True))
+
+        tail = encode("\n]\n") if export_format == "json" else b""
+        if compressor is not None:
+            tail += compressor.flush()
+        if tail:
+            yield tail
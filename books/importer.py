@@ -0,0 +1,217 @@
+import os
+import sys
+
+from datetime import datetime
+from itertools import islice
+from typing import Iterable
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.app_config import import_batch_size
+from books.models import Book, Authors
+from books.cache import genre_cache, author_cache, book_reads, search_reads
+from books.search_index import search_engine
+from books.search_cache import search_cache
+from app.invalidation import invalidation_bus
+from books.schemas import BookBase
+from auth.models import User, UserBooks
+
+
+def iter_batches(items: Iterable, size: int):
+
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+async def aiter_batches(items: Iterable, size: int):
+
+    # Rows are parsed and validated in a worker thread so reading the upload never blocks the event loop.
+    batches = iter_batches(items, size)
+    while True:
+        batch = await run_in_threadpool(next, batches, None)
+        if batch is None:
+            return
+        yield batch
+
+
+async def resolve_genres(session: AsyncSession, genre_names: set) -> dict:
+
+    if not genre_names:
+        return {}
+
+    return await genre_cache.get_ids(session, genre_names)
+
+
+def upsert_authors():
+
+    # The no-op DO UPDATE makes RETURNING yield the id of an author that already exists,
+    # including one committed by a concurrent writer after our snapshot.
+    stmt = pg_insert(Authors)
+    return stmt.on_conflict_do_update(
+        constraint="uq_Authors_author_name",
+        set_={"author_firstName": stmt.excluded.author_firstName}
+    )
+
+
+async def resolve_authors(session: AsyncSession, author_names: set) -> dict:
+
+    if not author_names:
+        return {}
+
+    authors = await author_cache.get_ids(session, author_names)
+
+    missing = [
+        {"author_firstName": first_name, "author_lastName": last_name}
+        for first_name, last_name in author_names if (first_name, last_name) not in authors
+    ]
+
+    if missing:
+        # Rows come back keyed by name, so RETURNING order does not matter here.
+        stmt = upsert_authors().returning(Authors.c.author_firstName, Authors.c.author_lastName, Authors.c.id)
+        result = await session.execute(stmt, missing)
+        for row in result:
+            author_name = (row.author_firstName, row.author_lastName)
+            authors[author_name] = row.id
+            author_cache.put_after_commit(session, author_name, row.id)
+
+    return authors
+
+
+async def bulk_create_books(session: AsyncSession, user: User, books_data: list, rejects: list = None) -> list:
+
+    # With a rejects list, invalid books are recorded there as (index, reason) and skipped instead of failing the batch.
+    def reject(index, reason):
+        if rejects is None:
+            raise HTTPException(status_code=400, detail=reason)
+        rejects.append((index, reason))
+
+    current_year = datetime.now().year
+    accepted = []
+
+    for index, book_data in enumerate(books_data):
+        if not (1800 <= book_data.published_years <= current_year):
+            reject(index, f"published_years must be between 1800 and {current_year}")
+        else:
+            accepted.append(index)
+
+    genre_names = {index: books_data[index].genre.strip() for index in accepted}
+    genres = await resolve_genres(session, set(genre_names.values()))
+
+    for index in list(accepted):
+        if genre_names[index] not in genres:
+            reject(index, f"Genre '{genre_names[index]}' not found")
+            accepted.remove(index)
+
+    if not accepted:
+        return []
+
+    author_names = {
+        index: (books_data[index].author.author_firstName.strip(), books_data[index].author.author_lastName.strip())
+        for index in accepted
+    }
+    authors = await resolve_authors(session, set(author_names.values()))
+
+    book_rows = [
+        {
+            "title": books_data[index].title,
+            "author": authors[author_names[index]],
+            "genre": genres[genre_names[index]],
+            "pages": books_data[index].pages,
+            "publisher": books_data[index].publisher,
+            "published_years": books_data[index].published_years,
+            "language": books_data[index].language,
+            "isbn": books_data[index].isbn,
+        }
+        for index in accepted
+    ]
+
+    stmt = insert(Book).returning(Book.c.id, sort_by_parameter_order=True)
+    result = await session.execute(stmt, book_rows)
+    book_ids = result.scalars().all()
+
+    await session.execute(insert(UserBooks), [{"user_id": user.id, "book_id": book_id} for book_id in book_ids])
+
+    if book_ids:
+        search_cache.stage(session)
+        book_reads.stage(session)
+        search_reads.stage(session)
+        invalidation_bus.publish(session, "books", ids=book_ids)
+
+    if search_engine.enabled:
+        for book_id, index, book_row in zip(book_ids, accepted, book_rows):
+            first_name, last_name = author_names[index]
+            search_engine.stage(session, "upsert", {
+                **book_row,
+                "id": book_id,
+                "author_firstName": first_name,
+                "author_lastName": last_name,
+                "genre_name": genre_names[index],
+            })
+
+    return book_ids
+
+
+async def import_books(session: AsyncSession, user: User, books_data: Iterable[BookBase],
+                       batch_size: int = import_batch_size, on_batch=None) -> int:
+
+    imported = 0
+
+    async for batch in aiter_batches(books_data, batch_size):
+        try:
+            book_ids = await bulk_create_books(session, user, batch)
+
+            if on_batch is not None:
+                await on_batch(session, imported + len(book_ids))
+
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+        imported += len(book_ids)
+
+    return imported
+
+
+
+async def import_books_resumable(session: AsyncSession, user: User, rows: Iterable,
+                                 batch_size: int = import_batch_size, on_batch=None) -> int:
+
+    # rows come from parse_books_file_leniently; on_batch(session, last_row_number, batch_imported, rejects)
+    # runs inside each batch transaction so the checkpoint commits atomically with the rows it covers.
+    imported = 0
+
+    async for batch in aiter_batches(rows, batch_size):
+
+        rejects = [(row_number, book_data, error) for row_number, book_data, book, error in batch if error]
+        valid = [(row_number, book_data, book) for row_number, book_data, book, error in batch if not error]
+
+        try:
+            book_rejects = []
+            book_ids = await bulk_create_books(session, user, [book for _, _, book in valid], rejects=book_rejects)
+
+            for index, reason in book_rejects:
+                row_number, book_data, _ = valid[index]
+                rejects.append((row_number, book_data, reason))
+
+            if on_batch is not None:
+                await on_batch(session, batch[-1][0], len(book_ids), sorted(rejects, key=lambda reject: reject[0]))
+
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+        imported += len(book_ids)
+
+    return imported
\ No newline at end of file
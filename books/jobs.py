@@ -0,0 +1,379 @@
+import os
+import sys
+import asyncio
+import csv
+import hashlib
+import json
+import tempfile
+import logging
+import contextvars
+
+from datetime import timedelta
+from io import StringIO
+from typing import NamedTuple
+
+from fastapi import HTTPException, UploadFile, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.app_config import import_job_concurrency, import_spool_dir, import_chunk_size, import_job_stale_seconds
+from config.db_config import async_session
+from books.models import ImportJobs, ImportRejects
+from books.importer import import_books, import_books_resumable
+from books.utils import parse_books_file, parse_books_file_leniently
+from auth.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedImport(NamedTuple):
+
+    job_id: int
+    attempt: int
+    user: User
+    path: str
+    file_type: str
+    resumable: bool
+
+
+class ImportWorkerPool:
+
+    def __init__(self, concurrency: int, session_factory):
+
+        self.concurrency = concurrency
+        self.session_factory = session_factory
+        self._queue = None
+        self._workers = []
+
+    def start(self):
+
+        if self._workers:
+            return
+
+        # Each worker gets an empty context: a task created during a request would otherwise keep that
+        # request's contextvars, and every job's queries would be counted against it.
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(), context=contextvars.Context()) for _ in range(self.concurrency)
+        ]
+
+    def submit(self, job: QueuedImport):
+
+        self.start()
+        self._queue.put_nowait(job)
+
+    async def recover(self) -> int:
+
+        # Only stale jobs: fresh ones may belong to another process that is still running them.
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(ImportJobs).where(
+                    ImportJobs.c.status.in_(("queued", "running")), import_job_is_stale()
+                ).values(
+                    status="interrupted",
+                    error="Import was interrupted by a restart",
+                    finished_at=func.localtimestamp(),
+                    updated_at=func.localtimestamp()
+                )
+            )
+            await session.commit()
+
+        return result.rowcount
+
+    async def stop(self):
+
+        for worker in self._workers:
+            worker.cancel()
+
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self):
+
+        while True:
+            job = await self._queue.get()
+            try:
+                async with self.session_factory() as session:
+                    await run_import_job(session, job)
+            except Exception as e:
+                logger.exception("Import job %s failed outside its own error handling: %s", job.job_id, e)
+            finally:
+                self._queue.task_done()
+
+
+import_pool = ImportWorkerPool(import_job_concurrency, async_session)
+
+
+def import_job_is_stale():
+
+    # A job nobody has touched for this long has lost the worker that was running it.
+    return func.coalesce(ImportJobs.c.updated_at, ImportJobs.c.created_at) < (
+        func.localtimestamp() - timedelta(seconds=import_job_stale_seconds)
+    )
+
+
+def spool_upload(fileobj) -> tuple:
+
+    descriptor, path = tempfile.mkstemp(prefix="book-import-", dir=import_spool_dir)
+    file_hash = hashlib.sha256()
+
+    with os.fdopen(descriptor, "wb") as spool:
+        while chunk := fileobj.read(import_chunk_size):
+            file_hash.update(chunk)
+            spool.write(chunk)
+
+    return path, file_hash.hexdigest()
+
+
+def describe_import_error(error: Exception) -> str:
+
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    if isinstance(error, json.JSONDecodeError):
+        return "Invalid JSON format"
+    if isinstance(error, UnicodeDecodeError):
+        return "File is not valid UTF-8"
+    if isinstance(error, csv.Error):
+        return f"CSV format error: {str(error)}"
+
+    return f"Internal Server Error: {error}"
+
+
+async def create_import_job(session: AsyncSession, user: User, file: UploadFile, file_type: str,
+                            resumable: bool = False):
+
+    # Returns (job_id, QueuedImport); the job is None when a resumable upload was already fully imported.
+    path, file_hash = await run_in_threadpool(spool_upload, file.file)
+
+    try:
+        previous = None
+
+        if resumable:
+            stale = import_job_is_stale()
+            query = select(ImportJobs, stale.label("stale")).where(
+                ImportJobs.c.user_id == user.id,
+                ImportJobs.c.file_hash == file_hash,
+                ImportJobs.c.resumable.is_(True)
+            ).order_by(ImportJobs.c.id.desc()).limit(1).with_for_update(of=ImportJobs)
+            result = await session.execute(query)
+            previous = result.fetchone()
+
+        if previous is not None and previous.status == "completed":
+            await session.commit()
+            os.remove(path)
+            return previous.id, None
+
+        if previous is not None and previous.status in ("queued", "running") and not previous.stale:
+            raise HTTPException(status_code=409, detail="This file is already being imported")
+
+        values = {
+            "filename": file.filename,
+            "status": "queued",
+            "bytes_total": os.path.getsize(path),
+            "bytes_processed": 0,
+            "error": None,
+            "finished_at": None,
+            "updated_at": func.localtimestamp(),
+        }
+
+        if previous is not None:
+            stmt = update(ImportJobs).where(ImportJobs.c.id == previous.id).values(
+                attempt=ImportJobs.c.attempt + 1, **values
+            ).returning(ImportJobs.c.id, ImportJobs.c.attempt)
+        else:
+            stmt = insert(ImportJobs).values(
+                user_id=user.id, resumable=resumable, file_hash=file_hash, **values
+            ).returning(ImportJobs.c.id, ImportJobs.c.attempt)
+
+        result = await session.execute(stmt)
+        job = result.fetchone()
+        await session.commit()
+
+    except Exception:
+        await session.rollback()
+        os.remove(path)
+        raise
+
+    return job.id, QueuedImport(job.id, job.attempt, user, path, file_type, resumable)
+
+
+async def finish_import_job(session: AsyncSession, job: QueuedImport, status: str, error: str = None, **values):
+
+    stmt = update(ImportJobs).where(ImportJobs.c.id == job.job_id, ImportJobs.c.attempt == job.attempt).values(
+        status=status,
+        error=error,
+        finished_at=func.localtimestamp(),
+        updated_at=func.localtimestamp(),
+        **values
+    )
+    await session.execute(stmt)
+    await session.commit()
+
+
+async def record_import_progress(session: AsyncSession, job: QueuedImport, **values):
+
+    stmt = update(ImportJobs).where(ImportJobs.c.id == job.job_id, ImportJobs.c.attempt == job.attempt).values(
+        status="running",
+        error=None,
+        finished_at=None,
+        updated_at=func.localtimestamp(),
+        **values
+    )
+    result = await session.execute(stmt)
+
+    if result.rowcount == 0:
+        raise RuntimeError("Import job was restarted by another upload")
+
+
+async def run_import_job(session: AsyncSession, job: QueuedImport):
+
+    try:
+        stmt = update(ImportJobs).where(ImportJobs.c.id == job.job_id, ImportJobs.c.attempt == job.attempt).values(
+            status="running",
+            error=None,
+            finished_at=None,
+            started_at=func.coalesce(ImportJobs.c.started_at, func.localtimestamp()),
+            updated_at=func.localtimestamp()
+        ).returning(ImportJobs.c.checkpoint_offset)
+        result = await session.execute(stmt)
+        checkpoint_offset = result.scalar_one_or_none()
+        await session.commit()
+
+        if checkpoint_offset is None:
+            return
+
+        with open(job.path, "rb") as fileobj:
+
+            if job.resumable:
+
+                async def record_batch(batch_session: AsyncSession, last_row_number: int, imported: int, rejects: list):
+
+                    if rejects:
+                        await batch_session.execute(insert(ImportRejects), [
+                            {
+                                "job_id": job.job_id,
+                                "row_number": row_number,
+                                "error": error,
+                                "row": json.dumps(book_data, default=str),
+                            }
+                            for row_number, book_data, error in rejects
+                        ])
+
+                    await record_import_progress(
+                        batch_session, job,
+                        checkpoint_offset=last_row_number,
+                        rows_processed=ImportJobs.c.rows_processed + imported,
+                        rows_rejected=ImportJobs.c.rows_rejected + len(rejects),
+                        bytes_processed=fileobj.tell()
+                    )
+
+                rows = parse_books_file_leniently(fileobj, job.file_type, skip_rows=checkpoint_offset)
+                await import_books_resumable(session, job.user, rows, on_batch=record_batch)
+
+            else:
+
+                async def track_progress(batch_session: AsyncSession, rows_processed: int):
+
+                    await record_import_progress(
+                        batch_session, job,
+                        rows_processed=rows_processed,
+                        bytes_processed=fileobj.tell()
+                    )
+
+                rows_processed = await import_books(
+                    session, job.user, parse_books_file(fileobj, job.file_type), on_batch=track_progress
+                )
+
+                if job.file_type == "csv" and not rows_processed:
+                    raise HTTPException(status_code=400, detail="CSV is empty or invalid format.")
+
+        await finish_import_job(session, job, "completed", bytes_processed=ImportJobs.c.bytes_total)
+
+    except asyncio.CancelledError:
+
+        async def interrupt():
+            await session.rollback()
+            await finish_import_job(session, job, "interrupted", "Import was interrupted")
+
+        await asyncio.shield(interrupt())
+        raise
+
+    except Exception as e:
+        await session.rollback()
+        await finish_import_job(session, job, "failed", describe_import_error(e))
+
+    finally:
+        os.remove(job.path)
+
+
+async def get_owned_import_job(session: AsyncSession, job_id: int, user: User, *columns):
+
+    query = select(ImportJobs, *columns).where(ImportJobs.c.id == job_id)
+    result = await session.execute(query)
+    job = result.fetchone()
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+
+    if job.user_id != user.id:
+        raise HTTPException(status_code=403, detail="You do not own this import job")
+
+    return job
+
+
+async def get_import_job(session: AsyncSession, job_id: int, user: User):
+
+    elapsed = func.extract(
+        "epoch", func.coalesce(ImportJobs.c.finished_at, func.localtimestamp()) - ImportJobs.c.started_at
+    )
+    job = await get_owned_import_job(session, job_id, user, elapsed.label("elapsed"))
+
+    elapsed = float(job.elapsed or 0)
+    rows_per_second = round(job.rows_processed / elapsed, 2) if elapsed > 0 else 0.0
+
+    eta_seconds = None
+    if job.status == "running" and job.bytes_processed:
+        eta_seconds = round((job.bytes_total - job.bytes_processed) * elapsed / job.bytes_processed, 1)
+
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "resumable": job.resumable,
+        "checkpoint_offset": job.checkpoint_offset,
+        "rows_processed": job.rows_processed,
+        "rows_rejected": job.rows_rejected,
+        "rows_per_second": rows_per_second,
+        "bytes_processed": job.bytes_processed,
+        "bytes_total": job.bytes_total,
+        "eta_seconds": eta_seconds,
+        "errors": [job.error] if job.error else [],
+        "rejects_url": f"/books/import-jobs/{job.id}/rejects" if job.rows_rejected else None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+async def get_import_job_rejects(session: AsyncSession, job_id: int, user: User):
+
+    await get_owned_import_job(session, job_id, user)
+
+    query = select(ImportRejects.c.row_number, ImportRejects.c.error, ImportRejects.c.row).where(
+        ImportRejects.c.job_id == job_id
+    ).order_by(ImportRejects.c.row_number)
+    result = await session.execute(query)
+
+    report = StringIO()
+    writer = csv.writer(report)
+    writer.writerow(["row_number", "error", "row"])
+    writer.writerows(result)
+
+    return Response(
+        content=report.getvalue(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="import-{job_id}-rejects.csv"'}
+    )
@@ -3,9 +3,11 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from sqlalchemy import Table, Column, BigInteger, String, ForeignKey, Integer
+from sqlalchemy import Table, Column, BigInteger, String, ForeignKey, Integer, Boolean, TIMESTAMP, UniqueConstraint, func
 from config.db_config import metaData
 
+# Substring search on title, isbn, author names and genre_name is served by pg_trgm GIN indexes
+# created in migration c9a4e7d2f815; they need the extension, so they are not declared here.
 Book = Table(
     "Book",
     metaData,
@@ -18,6 +20,7 @@ Book = Table(
     Column("published_years", Integer, nullable=False, index=True),
     Column("language", String, nullable=False, index=True),
     Column("isbn", String, nullable=False, index=True),
+    Column("version", Integer, nullable=False, default=1, server_default="1"),
 )
 
 Genres = Table(
@@ -32,5 +35,38 @@ Authors = Table(
     metaData,
     Column("id", BigInteger, primary_key=True, autoincrement=True),
     Column("author_lastName", String, nullable=False),
-    Column("author_firstName", String, nullable=False)
-)
\ No newline at end of file
+    Column("author_firstName", String, nullable=False),
+    UniqueConstraint("author_firstName", "author_lastName", name="uq_Authors_author_name"),
+)
+
+ImportJobs = Table(
+    "ImportJobs",
+    metaData,
+    Column("id", BigInteger, primary_key=True, autoincrement=True),
+    Column("user_id", BigInteger, ForeignKey("User.id"), nullable=False, index=True),
+    Column("filename", String, nullable=False),
+    Column("status", String, nullable=False, default="queued"),
+    Column("resumable", Boolean, nullable=False, default=False),
+    Column("file_hash", String, nullable=True, index=True),
+    Column("checkpoint_offset", BigInteger, nullable=False, default=0),
+    Column("attempt", Integer, nullable=False, default=0),
+    Column("rows_processed", BigInteger, nullable=False, default=0),
+    Column("rows_rejected", BigInteger, nullable=False, default=0),
+    Column("bytes_processed", BigInteger, nullable=False, default=0),
+    Column("bytes_total", BigInteger, nullable=False, default=0),
+    Column("error", String, nullable=True),
+    Column("created_at", TIMESTAMP, nullable=False, default=func.now()),
+    Column("started_at", TIMESTAMP, nullable=True),
+    Column("finished_at", TIMESTAMP, nullable=True),
+    Column("updated_at", TIMESTAMP, nullable=True),
+)
+
+ImportRejects = Table(
+    "ImportRejects",
+    metaData,
+    Column("id", BigInteger, primary_key=True, autoincrement=True),
+    Column("job_id", BigInteger, ForeignKey("ImportJobs.id"), nullable=False, index=True),
+    Column("row_number", BigInteger, nullable=False),
+    Column("error", String, nullable=False),
+    Column("row", String, nullable=False),
+)
@@ -1,14 +1,23 @@
 import os
 import sys
 
-from fastapi import Depends, APIRouter, Query, HTTPException, UploadFile, File
+from typing import Optional, List
+from fastapi import Depends, APIRouter, Query, HTTPException, UploadFile, File, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from config.db_config import get_session
-from books.utils import (get_books, create_book, search_book, delete_book_by_id, update_book_by_id,
-                         process_csv, process_json)
+from config.db_config import get_session, get_read_session, get_read_session_factory
+from books.utils import (get_books, get_books_batch, parse_book_ids, create_book, search_book, delete_book_by_id,
+                         update_book_by_id, process_csv, process_json, get_import_file_type)
+from books.cache import get_cache_stats
+from books.export import export_books, EXPORT_FORMATS
+from auth.cache import user_cache
+from books.search_index import search_engine
+from books.search_cache import search_cache
+from app.invalidation import invalidation_bus
+from books.jobs import create_import_job, run_import_job, import_pool, get_import_job, get_import_job_rejects
 from app.utils import get_current_user
 from auth.models import User
 from books.schemas import BookBase, BookSearch, BookUpdate
@@ -19,9 +28,21 @@ books = APIRouter(
 )
 
 @books.get("/bookID={bookID}")
-async def get_book_by_id(bookID: int, session: AsyncSession = Depends(get_session)):
+async def get_book_by_id(bookID: int, request: Request, response: Response,
+                         session: AsyncSession = Depends(get_read_session)):
 
-    return await get_books(session, bookID)
+    return await get_books(session, bookID, request.headers.get("if-none-match"), response)
+
+@books.get("/batch")
+async def get_books_by_ids(ids: List[str] = Query(...), session: AsyncSession = Depends(get_read_session)):
+
+    return await get_books_batch(session, parse_book_ids(ids))
+
+@books.get("/cache-stats")
+async def cache_stats(user: User = Depends(get_current_user)):
+
+    return {**get_cache_stats(), "users": user_cache.stats(), "search_index": search_engine.stats(),
+            "search_results": search_cache.stats(), "invalidation": invalidation_bus.stats()}
 
 @books.post("/create")
 async def create_book_record(book_data: BookBase, session: AsyncSession = Depends(get_session), user: User = Depends(get_current_user)):
@@ -31,11 +52,31 @@ async def create_book_record(book_data: BookBase, session: AsyncSession = Depend
 @books.get("/search")
 async def get_books_with_params(
     search_data: BookSearch = Depends(),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
     limit: int = Query(5, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    rank: bool = Query(False),
+    pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+    cursor: Optional[str] = Query(None),
+    facets: bool = Query(False),
+    total: bool = Query(False)
 ):
-    return await search_book(session, search_data, limit, offset)
+    return await search_book(session, search_data, limit, offset, rank, pagination, cursor, facets, total)
+
+@books.get("/export")
+async def export_books_with_params(
+    search_data: BookSearch = Depends(),
+    session_factory = Depends(get_read_session_factory),
+    format: str = Query("csv", pattern="^(csv|json|ndjson)$"),
+    gzip: bool = Query(False)
+):
+    media_type, extension = EXPORT_FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="books.{extension}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(export_books(session_factory, search_data, format, gzip), media_type=media_type,
+                             headers=headers)
 
 @books.delete("/delete={bookID}")
 async def delete_book(bookID: int, session: AsyncSession = Depends(get_session), user: User = Depends(get_current_user)):
@@ -57,24 +98,53 @@ async def patch_book(book_id: int,
     return await update_book_by_id(book_id, session, user, book_data)
 
 @books.post("/bulk-import-books")
-async def bulk_import_books(file: UploadFile = File(...), session: AsyncSession = Depends(get_session), user = Depends(get_current_user)):
+async def bulk_import_books(file: UploadFile = File(...),
+                            background: bool = Query(False),
+                            resumable: bool = Query(False),
+                            session: AsyncSession = Depends(get_session),
+                            user = Depends(get_current_user)):
 
     try:
 
-        file_content = await file.read()
+        file_type = get_import_file_type(file.filename)
+
+        if background or resumable:
 
-        if file.filename.endswith(".csv"):
+            job_id, job = await create_import_job(session, user, file, file_type, resumable)
 
-            await process_csv(file_content, session, user)
+            if job is None:
+                return {"message": "File already imported", "job_id": job_id}
 
-        elif file.filename.endswith(".json"):
+            if background:
+                import_pool.submit(job)
+                return {"message": "Import job queued", "job_id": job_id}
+
+            await run_import_job(session, job)
+
+            return {"message": "Import finished", "job": await get_import_job(session, job_id, user)}
+
+        if file_type == "csv":
+
+            await process_csv(file, session, user)
 
-            await process_json(file_content, session, user)
         else:
-            raise HTTPException(status_code=400, detail="Unsupported file type. Only CSV and JSON are allowed.")
+
+            await process_json(file, session, user)
 
         #await bulk_insert_books(books["created_books"])
 
         return {"message": "Books successfully imported"}
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error importing books: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error importing books: {str(e)}")
+
+@books.get("/import-jobs/{job_id}")
+async def get_import_job_status(job_id: int, session: AsyncSession = Depends(get_session), user = Depends(get_current_user)):
+
+    return await get_import_job(session, job_id, user)
+
+@books.get("/import-jobs/{job_id}/rejects")
+async def download_import_job_rejects(job_id: int, session: AsyncSession = Depends(get_session), user = Depends(get_current_user)):
+
+    return await get_import_job_rejects(session, job_id, user)
\ No newline at end of file
@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import asyncio
+
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.app_config import (search_cache_backend, search_cache_size, search_cache_ttl, search_cache_url,
+                               invalidation_bus_enabled)
+from books.schemas import BookSearch
+
+
+class MemoryBackend:
+
+    # Per-process LRU; a version bump drops every entry, since none of them can be read again.
+    def __init__(self, max_size: int, ttl: float):
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self._version = 0
+        self._entries = OrderedDict()
+
+    async def version(self) -> int:
+
+        return self._version
+
+    async def bump(self):
+
+        self._version += 1
+        self._entries.clear()
+
+    async def get(self, key: str):
+
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value):
+
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+
+        return {"backend": "memory", "size": len(self._entries), "max_size": self.max_size, "ttl": self.ttl}
+
+
+class LocalStore:
+
+    # The subset of the redis.asyncio client the external backend uses, kept in process for tests and dev.
+    def __init__(self):
+
+        self._values = {}
+
+    async def get(self, name: str):
+
+        entry = self._values.get(name)
+
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._values[name]
+            return None
+
+        return value
+
+    async def set(self, name: str, value, ex: float = None):
+
+        self._values[name] = (value if isinstance(value, bytes) else str(value).encode(),
+                              time.monotonic() + ex if ex else None)
+
+    async def incr(self, name: str) -> int:
+
+        value = int(await self.get(name) or 0) + 1
+        self._values[name] = (str(value).encode(), None)
+        return value
+
+
+class ExternalBackend:
+
+    # Shared by every worker; eviction is left to the store (maxmemory-policy allkeys-lru) and entry TTLs.
+    def __init__(self, client, ttl: float, prefix: str = "book-search"):
+
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def version(self) -> int:
+
+        return int(await self.client.get(f"{self.prefix}:version") or 0)
+
+    async def bump(self):
+
+        await self.client.incr(f"{self.prefix}:version")
+
+    async def get(self, key: str):
+
+        value = await self.client.get(f"{self.prefix}:{key}")
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value):
+
+        await self.client.set(f"{self.prefix}:{key}", json.dumps(value), ex=self.ttl)
+
+    def stats(self) -> dict:
+
+        return {"backend": "external", "store": type(self.client).__name__, "ttl": self.ttl}
+
+
+def build_backend(name: str):
+
+    if name == "memory":
+        if not invalidation_bus_enabled:
+            raise RuntimeError(
+                "SEARCH_CACHE_BACKEND=memory needs INVALIDATION_BUS=true: each worker keeps its own catalog version "
+                "and would serve stale results after writes on other workers"
+            )
+        return MemoryBackend(search_cache_size, search_cache_ttl)
+
+    if name == "local":
+        return ExternalBackend(LocalStore(), search_cache_ttl)
+
+    if name == "redis":
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            raise RuntimeError("SEARCH_CACHE_BACKEND=redis needs the redis package installed")
+        return ExternalBackend(Redis.from_url(search_cache_url), search_cache_ttl)
+
+    if name == "off":
+        return None
+
+    raise ValueError(f"Unknown search cache backend '{name}'")
+
+
+class SearchCache:
+
+    def __init__(self, backend):
+
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._bumps = set()
+
+    @property
+    def enabled(self) -> bool:
+
+        return self.backend is not None
+
+    @staticmethod
+    def filters(search_data: BookSearch) -> dict:
+
+        # ILIKE and pg_trgm similarity ignore case, so terms differing only in case share one entry.
+        return {
+            field: value.lower() if isinstance(value, str) else value
+            for field, value in search_data.dict().items() if value
+        }
+
+    @staticmethod
+    def key(search_data: BookSearch, limit: int, offset: int, rank: bool, pagination: str, after_id: int,
+            **extras) -> str:
+
+        page = {"after_id": after_id} if pagination == "cursor" else {"offset": offset}
+        extras = {name: value for name, value in extras.items() if value}
+        return json.dumps(
+            {**SearchCache.filters(search_data), **page, **extras, "limit": limit, "rank": rank}, sort_keys=True
+        )
+
+    async def lookup(self, key: str) -> tuple:
+
+        # Bumps from commits on this worker land before the lookup, so a client always sees its own writes.
+        if self._bumps:
+            await asyncio.gather(*self._bumps)
+
+        version = await self.backend.version()
+        value = await self.backend.get(f"{version}:{key}")
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return version, value
+
+    async def store(self, version: int, key: str, value):
+
+        # Stored under the version read before the query ran: a write that committed meanwhile has bumped it,
+        # so a result that might predate that write is never read back.
+        await self.backend.set(f"{version}:{key}", value)
+
+    def stage(self, session: AsyncSession):
+
+        if self.enabled:
+            session.sync_session.info["search_cache_stale"] = True
+
+    def bump(self):
+
+        task = asyncio.get_running_loop().create_task(self.backend.bump())
+        self._bumps.add(task)
+        task.add_done_callback(self._bumps.discard)
+
+    def stats(self) -> dict:
+
+        if not self.enabled:
+            return {"enabled": False}
+
+        return {"enabled": True, "hits": self.hits, "misses": self.misses, **self.backend.stats()}
+
+
+search_cache = SearchCache(build_backend(search_cache_backend))
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_catalog_version(session):
+
+    if session.info.pop("search_cache_stale", False):
+        search_cache.bump()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_version_bump(session):
+
+    session.info.pop("search_cache_stale", None)
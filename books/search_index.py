@@ -0,0 +1,429 @@
+import os
+import sys
+
+from array import array
+from heapq import merge
+from itertools import chain, islice
+
+from sqlalchemy import select, event
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.app_config import search_backend, invalidation_bus_enabled
+from books.models import Book, Genres, Authors
+from books.schemas import BookSearch
+
+def trigrams(value: str) -> set:
+
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def post(postings: dict, grams: set, value_id: int, dirty: set = None):
+
+    for gram in grams:
+        posting = postings.get(gram)
+        if posting is None:
+            posting = postings[gram] = array("I")
+        posting.append(value_id)
+        if dirty is not None:
+            dirty.add(id(posting))
+
+
+class Vocabulary:
+
+    # Distinct values (genres, author names) stored once, with trigram postings over each lower-cased part
+    # and the list of book slots that reference every value.
+    def __init__(self, parts: int):
+
+        self.values = []
+        self.ids = {}
+        self.grams = [{} for _ in range(parts)]
+        self.slots = []
+
+    def get_id(self, value: tuple) -> int:
+
+        value_id = self.ids.get(value)
+
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+            self.slots.append(array("I"))
+            for part, postings in zip(value, self.grams):
+                post(postings, trigrams(part.lower()), value_id)
+
+        return value_id
+
+    def match(self, terms: list):
+
+        # Returns the ids whose parts contain every given term, or None when no term was given.
+        matched = None
+
+        for part, term in enumerate(terms):
+            if not term:
+                continue
+
+            if len(term) >= 3:
+                postings = [self.grams[part].get(gram) for gram in trigrams(term)]
+                candidates = set() if None in postings else set(min(postings, key=len))
+            else:
+                candidates = range(len(self.values))
+
+            found = {value_id for value_id in candidates if term in self.values[value_id][part].lower()}
+            matched = found if matched is None else matched & found
+
+        return matched
+
+
+class InvertedIndex:
+
+    def __init__(self):
+
+        self._slots = {}
+        self._ids = array("q")
+        self._years = array("i")
+        self._pages = array("i")
+        self._authors = array("I")
+        self._genres = array("I")
+        self._live = bytearray()
+        self._titles = []
+        self._isbns = []
+        self._publishers = []
+        self._languages = []
+        self._strings = {}
+        self._title_grams = {}
+        self._isbn_grams = {}
+        self._year_slots = {}
+        self._author_vocabulary = Vocabulary(parts=2)
+        self._genre_vocabulary = Vocabulary(parts=1)
+        self._stale = 0
+        self._ordered = True
+        self._dirty = set()
+
+    def __len__(self):
+
+        return len(self._slots)
+
+    def _intern(self, value: str) -> str:
+
+        return self._strings.setdefault(value, value)
+
+    def _append(self, book: dict):
+
+        slot = len(self._ids)
+        book_id = book["id"]
+
+        if self._ids and book_id < self._ids[-1]:
+            self._ordered = False
+
+        author_id = self._author_vocabulary.get_id((book["author_firstName"], book["author_lastName"]))
+        genre_id = self._genre_vocabulary.get_id((book["genre_name"],))
+
+        self._slots[book_id] = slot
+        self._ids.append(book_id)
+        self._years.append(book["published_years"])
+        self._pages.append(book["pages"])
+        self._authors.append(author_id)
+        self._genres.append(genre_id)
+        self._live.append(1)
+        self._titles.append(book["title"])
+        self._isbns.append(book["isbn"])
+        self._publishers.append(self._intern(book["publisher"]))
+        self._languages.append(self._intern(book["language"]))
+
+        post(self._title_grams, trigrams(book["title"].lower()), slot)
+        post(self._isbn_grams, trigrams(book["isbn"].lower()), slot)
+        post(self._year_slots, {book["published_years"]}, slot)
+        self._author_vocabulary.slots[author_id].append(slot)
+        self._genre_vocabulary.slots[genre_id].append(slot)
+
+    def row(self, slot: int) -> dict:
+
+        first_name, last_name = self._author_vocabulary.values[self._authors[slot]]
+
+        return {
+            "id": self._ids[slot],
+            "title": self._titles[slot],
+            "published_years": self._years[slot],
+            "isbn": self._isbns[slot],
+            "pages": self._pages[slot],
+            "publisher": self._publishers[slot],
+            "language": self._languages[slot],
+            "author_firstName": first_name,
+            "author_lastName": last_name,
+            "genre_name": self._genre_vocabulary.values[self._genres[slot]][0],
+        }
+
+    def upsert(self, book: dict):
+
+        slot = self._slots.get(book["id"])
+
+        if slot is None:
+            self._append(book)
+        else:
+            self.update(book["id"], book)
+
+    def update(self, book_id: int, fields: dict):
+
+        # Postings only ever grow: grams a book no longer has stay behind and are filtered out on read.
+        slot = self._slots.get(book_id)
+
+        if slot is None:
+            return
+
+        self._stale += 1
+
+        if "title" in fields:
+            new_grams = trigrams(fields["title"].lower()) - trigrams(self._titles[slot].lower())
+            post(self._title_grams, new_grams, slot, self._dirty)
+            self._titles[slot] = fields["title"]
+
+        if "isbn" in fields:
+            new_grams = trigrams(fields["isbn"].lower()) - trigrams(self._isbns[slot].lower())
+            post(self._isbn_grams, new_grams, slot, self._dirty)
+            self._isbns[slot] = fields["isbn"]
+
+        if "published_years" in fields and fields["published_years"] != self._years[slot]:
+            post(self._year_slots, {fields["published_years"]}, slot, self._dirty)
+            self._years[slot] = fields["published_years"]
+
+        if "author_firstName" in fields or "author_lastName" in fields:
+            first_name, last_name = self._author_vocabulary.values[self._authors[slot]]
+            author_id = self._author_vocabulary.get_id((
+                fields.get("author_firstName", first_name), fields.get("author_lastName", last_name)
+            ))
+            if author_id != self._authors[slot]:
+                self._author_vocabulary.slots[author_id].append(slot)
+                self._dirty.add(id(self._author_vocabulary.slots[author_id]))
+                self._authors[slot] = author_id
+
+        if "genre_name" in fields:
+            genre_id = self._genre_vocabulary.get_id((fields["genre_name"],))
+            if genre_id != self._genres[slot]:
+                self._genre_vocabulary.slots[genre_id].append(slot)
+                self._dirty.add(id(self._genre_vocabulary.slots[genre_id]))
+                self._genres[slot] = genre_id
+
+        if "pages" in fields:
+            self._pages[slot] = fields["pages"]
+        if "publisher" in fields:
+            self._publishers[slot] = self._intern(fields["publisher"])
+        if "language" in fields:
+            self._languages[slot] = self._intern(fields["language"])
+
+        self._compact_if_stale()
+
+    def remove(self, book_id: int):
+
+        slot = self._slots.pop(book_id, None)
+
+        if slot is None:
+            return
+
+        self._live[slot] = 0
+        self._stale += 1
+        self._compact_if_stale()
+
+    def _compact_if_stale(self):
+
+        if self._stale > 1000 and self._stale * 4 > len(self._ids):
+            self.compact()
+
+    def compact(self):
+
+        books = [self.row(slot) for slot in sorted(self._slots.values(), key=self._ids.__getitem__)]
+        self.__init__()
+        for book in books:
+            self._append(book)
+
+    def _candidates(self, search_data: BookSearch, authors, genres):
+
+        # Picks the smallest posting source among the filters; every candidate is verified afterwards.
+        sources = []
+
+        for term, postings in ((search_data.title, self._title_grams), (search_data.isbn, self._isbn_grams)):
+            if term and len(term) >= 3:
+                lists = [postings.get(gram) for gram in trigrams(term.lower())]
+                if None in lists:
+                    return []
+                sources.append([min(lists, key=len)])
+
+        if search_data.published_years:
+            sources.append([self._year_slots.get(search_data.published_years, array("I"))])
+
+        for matched, vocabulary in ((authors, self._author_vocabulary), (genres, self._genre_vocabulary)):
+            if matched is not None:
+                sources.append([vocabulary.slots[value_id] for value_id in matched])
+
+        if not sources:
+            return range(len(self._ids))
+
+        lists = min(sources, key=lambda source: sum(map(len, source)))
+
+        # Posting lists are ascending and duplicate free unless an in-place update appended an older slot.
+        if not any(id(posting) in self._dirty for posting in lists):
+            return lists[0] if len(lists) == 1 else merge(*lists)
+
+        return sorted(set(chain.from_iterable(lists)))
+
+    def search(self, search_data: BookSearch, limit: int, offset: int = 0, after_id: int = None) -> list:
+
+        title = search_data.title.lower() if search_data.title else None
+        isbn = search_data.isbn.lower() if search_data.isbn else None
+        year = search_data.published_years
+
+        authors = self._author_vocabulary.match([
+            search_data.author_firstName.lower() if search_data.author_firstName else None,
+            search_data.author_lastName.lower() if search_data.author_lastName else None,
+        ])
+        genres = self._genre_vocabulary.match([search_data.genre.lower() if search_data.genre else None])
+
+        if (authors is not None and not authors) or (genres is not None and not genres):
+            return []
+
+        def matches():
+            for slot in self._candidates(search_data, authors, genres):
+                if not self._live[slot]:
+                    continue
+                if after_id is not None and self._ids[slot] <= after_id:
+                    continue
+                if year and self._years[slot] != year:
+                    continue
+                if title and title not in self._titles[slot].lower():
+                    continue
+                if isbn and isbn not in self._isbns[slot].lower():
+                    continue
+                if authors is not None and self._authors[slot] not in authors:
+                    continue
+                if genres is not None and self._genres[slot] not in genres:
+                    continue
+                yield slot
+
+        if after_id is not None and not self._ordered:
+            slots = sorted(matches(), key=self._ids.__getitem__)[offset:offset + limit]
+        else:
+            slots = islice(matches(), offset, offset + limit)
+
+        return [self.row(slot) for slot in slots]
+
+    def stats(self) -> dict:
+
+        return {
+            "books": len(self._slots),
+            "slots": len(self._ids),
+            "authors": len(self._author_vocabulary.values),
+            "genres": len(self._genre_vocabulary.values),
+            "title_grams": len(self._title_grams),
+            "isbn_grams": len(self._isbn_grams),
+        }
+
+
+def index_query():
+
+    return select(
+        Book.c.id, Book.c.title, Book.c.published_years, Book.c.isbn, Book.c.pages, Book.c.publisher,
+        Book.c.language, Authors.c.author_firstName, Authors.c.author_lastName, Genres.c.genre_name
+    ).join(Authors, Book.c.author == Authors.c.id).join(Genres, Book.c.genre == Genres.c.id)
+
+
+class SearchEngine:
+
+    def __init__(self, enabled: bool):
+
+        if enabled and not invalidation_bus_enabled:
+            raise RuntimeError(
+                "SEARCH_BACKEND=memory needs INVALIDATION_BUS=true: each worker keeps its own index and would never "
+                "see writes made on other workers"
+            )
+
+        self.enabled = enabled
+        self.index = None
+        self._building = False
+        self._backlog = []
+
+    @property
+    def ready(self) -> bool:
+
+        return self.enabled and self.index is not None
+
+    async def build(self, session: AsyncSession, batch_size: int = 10000):
+
+        self._building = True
+        self._backlog = []
+
+        try:
+            query = index_query().order_by(Book.c.id)
+
+            index = InvertedIndex()
+            result = await session.stream(query.execution_options(yield_per=batch_size))
+            async for partition in result.mappings().partitions():
+                for book in partition:
+                    index.upsert(book)
+
+            # Writes committed while the snapshot was streaming are replayed on top of it.
+            for change in self._backlog:
+                self._apply(index, change)
+
+            self.index = index
+        finally:
+            self._building = False
+            self._backlog = []
+
+    async def refresh(self, session: AsyncSession, ids: list = None, id_range: tuple = None):
+
+        # Re-reads books another process changed: rows found are upserted, listed ids that are gone are removed.
+        query = index_query()
+        query = query.where(Book.c.id.in_(ids)) if ids is not None else query.where(Book.c.id.between(*id_range))
+
+        result = await session.execute(query)
+        found = set()
+        for book in result.mappings():
+            found.add(book["id"])
+            self.apply(("upsert", dict(book)))
+
+        for book_id in set(ids or ()) - found:
+            self.apply(("remove", book_id))
+
+    def stage(self, session: AsyncSession, *change):
+
+        # Changes are applied only when the transaction that made them commits.
+        if self.enabled:
+            session.sync_session.info.setdefault("search_index_changes", []).append(change)
+
+    def apply(self, change: tuple):
+
+        if self._building:
+            self._backlog.append(change)
+        if self.index is not None:
+            self._apply(self.index, change)
+
+    @staticmethod
+    def _apply(index: InvertedIndex, change: tuple):
+
+        operation, *arguments = change
+        getattr(index, operation)(*arguments)
+
+    def search(self, search_data: BookSearch, limit: int, offset: int = 0, after_id: int = None) -> list:
+
+        return self.index.search(search_data, limit, offset, after_id)
+
+    def stats(self) -> dict:
+
+        return {"enabled": self.enabled, "ready": self.ready, **(self.index.stats() if self.index else {})}
+
+
+search_engine = SearchEngine(search_backend == "memory")
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_search_index_changes(session):
+
+    for change in session.info.pop("search_index_changes", []):
+        search_engine.apply(change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_search_index_changes(session):
+
+    session.info.pop("search_index_changes", None)
@@ -0,0 +1,133 @@
+import os
+import sys
+import codecs
+import csv
+import json
+import re
+
+from typing import BinaryIO, Iterator
+
+from fastapi import HTTPException
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.app_config import import_chunk_size
+
+_whitespace = re.compile(r"[ \t\r\n]*")
+
+
+def iter_text_chunks(fileobj: BinaryIO, chunk_size: int = import_chunk_size) -> Iterator[str]:
+
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+    while True:
+        chunk = fileobj.read(chunk_size)
+
+        if not chunk:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+
+
+def iter_lines(chunks: Iterator[str]) -> Iterator[str]:
+
+    rest = ""
+
+    for chunk in chunks:
+        lines = (rest + chunk).split("\n")
+        rest = lines.pop()
+
+        for line in lines:
+            yield line + "\n"
+
+    if rest:
+        yield rest
+
+
+def iter_csv_rows(fileobj: BinaryIO) -> Iterator[dict]:
+
+    return csv.DictReader(iter_lines(iter_text_chunks(fileobj)))
+
+
+def iter_json_objects(fileobj: BinaryIO, max_object_size: int = 1024 * 1024) -> Iterator:
+
+    # Accepts a JSON array of books, a single book object or NDJSON (one object per line).
+    decoder = json.JSONDecoder()
+    chunks = iter_text_chunks(fileobj)
+
+    buffer = ""
+    position = 0
+    eof = False
+    in_array = None
+    closed = False
+    expect_separator = False
+
+    while True:
+
+        position = _whitespace.match(buffer, position).end()
+
+        if position == len(buffer):
+            if eof:
+                if in_array:
+                    raise json.JSONDecodeError("Unterminated array", buffer, position)
+                if in_array is None:
+                    raise json.JSONDecodeError("Expecting value", buffer, position)
+                return
+
+            chunk = next(chunks, None)
+            if chunk is None:
+                eof = True
+            else:
+                buffer = buffer[position:] + chunk
+                position = 0
+            continue
+
+        if closed:
+            raise json.JSONDecodeError("Extra data", buffer, position)
+
+        if in_array is None:
+            in_array = buffer[position] == "["
+            if in_array:
+                position += 1
+            continue
+
+        if in_array:
+            if buffer[position] == "]":
+                in_array = False
+                closed = True
+                position += 1
+                continue
+
+            if expect_separator:
+                if buffer[position] != ",":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position)
+                position += 1
+                expect_separator = False
+                continue
+
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof or len(buffer) - position > max_object_size:
+                raise
+
+            chunk = next(chunks, None)
+            if chunk is None:
+                eof = True
+            else:
+                buffer = buffer[position:] + chunk
+                position = 0
+            continue
+
+        if not in_array and not isinstance(value, dict):
+            raise HTTPException(status_code=400, detail="Invalid JSON format. Expected a list of books.")
+
+        position = end
+        expect_separator = True
+        yield value
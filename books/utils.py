@@ -2,55 +2,125 @@ import os
 import sys
 import json
 import csv
+import base64
 
 from pydantic import ValidationError
-from sqlalchemy import select, insert, delete, update
+from sqlalchemy import select, insert, delete, update, func, any_, literal, tuple_, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError, InterfaceError
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 from datetime import datetime
-from io import StringIO
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from books.models import Book, Genres, Authors
 from books.schemas import BookBase, BookSearch, BookUpdate, AuthorBase
 from auth.models import User, UserBooks
-
-async def get_books(session: AsyncSession, bookID: int):
+from books.importer import import_books, upsert_authors
+from books.cache import genre_cache, author_cache, book_reads, search_reads
+from books.search_index import search_engine
+from books.search_cache import SearchCache, search_cache
+from app.invalidation import invalidation_bus
+from books.streaming import iter_csv_rows, iter_json_objects
+from config.app_config import book_cache_control, book_batch_max, search_exact_count_limit, search_facet_limit
+
+def book_details_query():
+
+    return select(
+        Book.c.id,
+        Book.c.title,
+        (Authors.c.author_lastName + " " + Authors.c.author_firstName).label("author"),
+        Book.c.pages,
+        Genres.c.genre_name.label("genre"),
+        Book.c.publisher,
+        Book.c.published_years,
+        Book.c.language,
+        Book.c.isbn
+    ).select_from(
+        Book.join(Authors, Book.c.author == Authors.c.id).join(Genres, Book.c.genre == Genres.c.id)
+    )
+
+def book_etag(bookID: int, version: int) -> str:
+
+    return f'"book-{bookID}-v{version}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+
+    # If-None-Match uses weak comparison, so a W/ prefix added by a proxy still matches.
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+async def get_books(session: AsyncSession, bookID: int, if_none_match: str = None, response: Response = None):
 
     try:
-        query = select(Book).where(Book.c.id == bookID)
-        result = await session.execute(query)
+        # A revalidation only needs the version, so a matching ETag is answered without the joins or serialization.
+        if if_none_match:
+            version = await book_reads.do(
+                session, ("version", bookID), lambda: session.scalar(select(Book.c.version).where(Book.c.id == bookID))
+            )
+            if version is not None and etag_matches(if_none_match, book_etag(bookID, version)):
+                return Response(status_code=304, headers={
+                    "ETag": book_etag(bookID, version), "Cache-Control": book_cache_control
+                })
 
-        book = result.fetchone()
+        async def fetch_book():
+            query = book_details_query().add_columns(Book.c.version).where(Book.c.id == bookID)
+            result = await session.execute(query)
+            return result.mappings().fetchone()
+
+        book = await book_reads.do(session, ("book", bookID), fetch_book)
 
         if book is None:
             raise HTTPException(status_code=404, detail="Book not found")
 
-        book_data = {column: value for column, value in zip(result.keys(), book)}
+        book = dict(book)
+        version = book.pop("version")
 
-        if book_data.get('genre') is not None:
-            related_query = select(Genres).where(Genres.c.id == book_data['genre'])
-            related_result = await session.execute(related_query)
-            related_data = related_result.fetchone()
+        if response is not None:
+            response.headers["ETag"] = book_etag(bookID, version)
+            response.headers["Cache-Control"] = book_cache_control
 
-            if related_data is not None:
-                book_data['genre'] = related_data.genre_name
+        return {"message": "success", "data": book}
 
-        if book_data.get('author') is not None:
-            related_query = select(Authors).where(Authors.c.id == book_data['author'])
-            related_result = await session.execute(related_query)
-            related_data = related_result.fetchone()
+    except HTTPException as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e.detail))
 
-            if related_data is not None:
-                book_data['author'] = f"{related_data.author_lastName} {related_data.author_firstName}"
+def parse_book_ids(values: list) -> list:
 
-        return {"message": "success", "data": book_data}
+    # Accepts ids=1,2,3 as well as repeated ids=1&ids=2.
+    ids = []
+    for value in values:
+        for part in value.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                ids.append(int(part))
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid book id '{part}'")
 
-    except HTTPException as e:
-        raise HTTPException(status_code=e.status_code, detail=str(e.detail))
+    if not ids:
+        raise HTTPException(status_code=400, detail="No book ids given")
+
+    if len(ids) > book_batch_max:
+        raise HTTPException(status_code=400, detail=f"At most {book_batch_max} book ids can be fetched at once")
+
+    return ids
+
+async def get_books_batch(session: AsyncSession, ids: list):
+
+    # One array parameter keeps a single statement shape whatever the number of ids.
+    query = book_details_query().where(Book.c.id == any_(literal(list(dict.fromkeys(ids)), ARRAY(BigInteger))))
+    result = await session.execute(query)
+    books = {book["id"]: dict(book) for book in result.mappings()}
+
+    return {"message": "success", "data": [
+        {"id": book_id, "status": 200, "data": books[book_id]} if book_id in books
+        else {"id": book_id, "status": 404, "detail": "Book not found"}
+        for book_id in ids
+    ]}
 
 async def create_book(session: AsyncSession, user: User, book_data: BookBase):
     try:
@@ -60,9 +130,7 @@ async def create_book(session: AsyncSession, user: User, book_data: BookBase):
             raise ValueError(f"published_years must be between 1800 and {current_year}")
 
         genre_name = book_data.genre.strip()
-        genre_query = select(Genres.c.id).where(Genres.c.genre_name == genre_name)
-        result = await session.execute(genre_query)
-        genre_id = result.scalar_one_or_none()
+        genre_id = await genre_cache.get_id(session, genre_name)
 
         if genre_id is None:
 
@@ -70,42 +138,57 @@ async def create_book(session: AsyncSession, user: User, book_data: BookBase):
 
         author_firstName = book_data.author.author_firstName.strip()
         author_lastName = book_data.author.author_lastName.strip()
-        author_query = select(Authors.c.id).where(
-            Authors.c.author_firstName == author_firstName,
-            Authors.c.author_lastName == author_lastName
-        )
-        result = await session.execute(author_query)
-        author_id = result.scalar_one_or_none()
+        author_id = author_cache.peek((author_firstName, author_lastName))
 
+        # Author upsert, book insert and ownership link run as one statement, so a create either fully
+        # lands or leaves nothing behind.
         if author_id is None:
-            stmt = insert(Authors).values(
+            author_row = upsert_authors().values(
                 author_firstName=author_firstName,
                 author_lastName=author_lastName
-            ).returning(Authors.c.id)
-            result = await session.execute(stmt)
-            author_id = result.scalar_one()
-            await session.commit()
-
-        stmt = insert(Book).values(
-            title=book_data.title,
-            author=author_id,
-            genre=genre_id,
-            pages=book_data.pages,
-            publisher=book_data.publisher,
-            published_years=book_data.published_years,
-            language=book_data.language,
-            isbn=book_data.isbn
-        ).returning(Book.c.id)
-
-        result = await session.execute(stmt)
-        book_id = result.scalar_one()
-        await session.commit()
-
-        stmt = insert(UserBooks).values(
-            user_id=user.id,
-            book_id=book_id
-        )
-        await session.execute(stmt)
+            ).returning(Authors.c.id).cte("author_row")
+            book_author = select(author_row.c.id.label("author"))
+        else:
+            book_author = select(literal(author_id, BigInteger).label("author"))
+
+        new_book = insert(Book).from_select(
+            ["author", "title", "genre", "pages", "publisher", "published_years", "language", "isbn"],
+            book_author.add_columns(
+                literal(book_data.title),
+                literal(genre_id, BigInteger),
+                literal(book_data.pages),
+                literal(book_data.publisher),
+                literal(book_data.published_years),
+                literal(book_data.language),
+                literal(book_data.isbn)
+            ),
+            include_defaults=False
+        ).returning(Book.c.id, Book.c.author).cte("new_book")
+
+        link = insert(UserBooks).from_select(
+            ["user_id", "book_id"], select(literal(user.id, BigInteger), new_book.c.id)
+        ).cte("link")
+
+        result = await session.execute(select(new_book.c.id, new_book.c.author).add_cte(link))
+        book_id, author_id = result.one()
+
+        author_cache.put_after_commit(session, (author_firstName, author_lastName), author_id)
+        search_engine.stage(session, "upsert", {
+            "id": book_id,
+            "title": book_data.title,
+            "published_years": book_data.published_years,
+            "isbn": book_data.isbn,
+            "pages": book_data.pages,
+            "publisher": book_data.publisher,
+            "language": book_data.language,
+            "author_firstName": author_firstName,
+            "author_lastName": author_lastName,
+            "genre_name": genre_name,
+        })
+        search_cache.stage(session)
+        book_reads.stage(session)
+        search_reads.stage(session)
+        invalidation_bus.publish(session, "books", ids=[book_id])
         await session.commit()
 
         return {"message": "Book created successfully", "book_id": book_id}
@@ -129,82 +212,282 @@ async def create_book(session: AsyncSession, user: User, book_data: BookBase):
         await session.rollback()
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
 
-async def search_book(session: AsyncSession, search_data: BookSearch, limit: int = 5, offset: int = 0):
+def encode_cursor(book_id: int) -> str:
+
+    return base64.urlsafe_b64encode(json.dumps({"id": book_id}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+
     try:
-        author_alias = aliased(Authors)
-        genre_alias = aliased(Genres)
+        padded = cursor + "=" * (-len(cursor) % 4)
+        book_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+        if not isinstance(book_id, int):
+            raise ValueError(book_id)
+        return book_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def search_query(search_data: BookSearch, rank: bool = False):
+
+    author_alias = aliased(Authors)
+    genre_alias = aliased(Genres)
+
+    stmt = select(
+        Book.c.id,
+        Book.c.title,
+        Book.c.published_years,
+        Book.c.isbn,
+        Book.c.pages,
+        Book.c.publisher,
+        Book.c.language,
+        author_alias.c.author_firstName,
+        author_alias.c.author_lastName,
+        genre_alias.c.genre_name
+    ).join(
+        author_alias, Book.c.author == author_alias.c.id
+    ).join(
+        genre_alias, Book.c.genre == genre_alias.c.id
+    )
+
+    if search_data.title:
+        stmt = stmt.filter(Book.c.title.ilike(f"%{search_data.title}%"))
+    if search_data.author_firstName:
+        stmt = stmt.filter(author_alias.c.author_firstName.ilike(f"%{search_data.author_firstName}%"))
+    if search_data.author_lastName:
+        stmt = stmt.filter(author_alias.c.author_lastName.ilike(f"%{search_data.author_lastName}%"))
+    if search_data.genre:
+        stmt = stmt.filter(genre_alias.c.genre_name.ilike(f"%{search_data.genre}%"))
+    if search_data.published_years:
+        stmt = stmt.filter(Book.c.published_years == search_data.published_years)
+    if search_data.isbn:
+        stmt = stmt.filter(Book.c.isbn.ilike(f"%{search_data.isbn}%"))
+
+    # The ILIKE filters are served by the pg_trgm GIN indexes; similarity() ranks the matches.
+    if rank:
+        text_filters = [
+            (Book.c.title, search_data.title),
+            (author_alias.c.author_firstName, search_data.author_firstName),
+            (author_alias.c.author_lastName, search_data.author_lastName),
+            (genre_alias.c.genre_name, search_data.genre),
+            (Book.c.isbn, search_data.isbn),
+        ]
+        similarities = [func.similarity(column, term) for column, term in text_filters if term]
+
+        if similarities:
+            relevance = similarities[0] if len(similarities) == 1 else func.greatest(*similarities)
+            stmt = stmt.add_columns(relevance.label("relevance")).order_by(relevance.desc(), Book.c.id)
+
+    return stmt
+
+# Facet name -> column of search_query(); the order fixes the bits of GROUPING() below.
+SEARCH_FACETS = {
+    "genre": "genre_name",
+    "language": "language",
+    "published_years": "published_years",
+    "publisher": "publisher",
+}
+
+def facet_query(search_data: BookSearch, facet_limit: int):
+
+    # One pass over the matches: a grouping set per facet plus the empty set, whose single row is the total.
+    # GROUPING() sets a bit for every column a row is not grouped by, which tells the sets apart even when a
+    # facet value is NULL.
+    matches = search_query(search_data).subquery()
+    dimensions = [matches.c[column] for column in SEARCH_FACETS.values()]
+
+    grouped = select(
+        *dimensions,
+        func.grouping(*dimensions).label("grouping"),
+        func.count().label("hits")
+    ).group_by(
+        func.grouping_sets(*[tuple_(dimension) for dimension in dimensions], tuple_())
+    ).subquery()
+
+    position = func.row_number().over(
+        partition_by=grouped.c.grouping,
+        order_by=[grouped.c.hits.desc(), *[grouped.c[column] for column in SEARCH_FACETS.values()]]
+    ).label("position")
+    ranked = select(grouped, position).subquery()
+
+    return select(ranked).where(ranked.c.position <= facet_limit).order_by(ranked.c.grouping, ranked.c.position)
+
+async def estimate_rows(session: AsyncSession, stmt) -> int:
+
+    # The planner's row estimate for the statement, read from EXPLAIN without running it.
+    connection = await session.connection()
+    compiled = stmt.compile(dialect=connection.dialect)
+    parameters = tuple(compiled.params[name] for name in compiled.positiontup or ())
+    result = await connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), parameters)
+
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+async def count_matches(session: AsyncSession, search_data: BookSearch,
+                        exact_limit: int = search_exact_count_limit) -> tuple:
+
+    # Counting stops one row past the limit, so a broad search never scans every match just to be counted;
+    # past it the total is the planner's estimate, never reported below what was actually seen.
+    stmt = search_query(search_data)
+    bounded = await session.scalar(select(func.count()).select_from(stmt.limit(exact_limit + 1).subquery()))
+
+    if bounded <= exact_limit:
+        return bounded, True
+
+    return max(await estimate_rows(session, stmt), bounded), False
+
+async def search_summary(session: AsyncSession, search_data: BookSearch, facets: bool, total: bool) -> dict:
+
+    summary = {}
+
+    if facets:
+        full_mask = (1 << len(SEARCH_FACETS)) - 1
+        masks = {full_mask ^ (1 << bit): name for bit, name in enumerate(reversed(SEARCH_FACETS))}
+        summary["facets"] = {name: [] for name in SEARCH_FACETS}
+
+        result = await session.execute(facet_query(search_data, search_facet_limit))
+        for row in result.mappings():
+            if row["grouping"] == full_mask:
+                matches = row["hits"]
+            else:
+                name = masks[row["grouping"]]
+                summary["facets"][name].append({"value": row[SEARCH_FACETS[name]], "count": row["hits"]})
 
-        stmt = select(
-            Book.c.id,
-            Book.c.title,
-            Book.c.published_years,
-            Book.c.isbn,
-            Book.c.pages,
-            Book.c.publisher,
-            Book.c.language,
-            author_alias.c.author_firstName,
-            author_alias.c.author_lastName,
-            genre_alias.c.genre_name
-        ).join(
-            author_alias, Book.c.author == author_alias.c.id
-        ).join(
-            genre_alias, Book.c.genre == genre_alias.c.id
+    if total:
+        # The grouped query has already counted every match exactly.
+        summary["total"], summary["total_exact"] = (matches, True) if facets else await count_matches(
+            session, search_data
         )
 
-        if search_data.title:
-            stmt = stmt.filter(Book.c.title.ilike(f"%{search_data.title}%"))
-        if search_data.author_firstName:
-            stmt = stmt.filter(author_alias.c.author_firstName.ilike(f"%{search_data.author_firstName}%"))
-        if search_data.author_lastName:
-            stmt = stmt.filter(author_alias.c.author_lastName.ilike(f"%{search_data.author_lastName}%"))
-        if search_data.genre:
-            stmt = stmt.filter(genre_alias.c.genre_name.ilike(f"%{search_data.genre}%"))
-        if search_data.published_years:
-            stmt = stmt.filter(Book.c.published_years == search_data.published_years)
-        if search_data.isbn:
-            stmt = stmt.filter(Book.c.isbn.ilike(f"%{search_data.isbn}%"))
-
-        stmt = stmt.limit(limit).offset(offset)
+    return summary
 
-        result = await session.execute(stmt)
-        books = result.mappings().all()
+async def search_book(session: AsyncSession, search_data: BookSearch, limit: int = 5, offset: int = 0,
+                      rank: bool = False, pagination: str = "offset", cursor: str = None, facets: bool = False,
+                      total: bool = False):
+    try:
+        if cursor is not None:
+            pagination = "cursor"
+
+        if pagination == "cursor" and rank:
+            raise HTTPException(status_code=400, detail="Cursor pagination cannot be combined with rank")
 
-        return {"books": books, "limit": limit, "offset": offset}
+        after_id = decode_cursor(cursor) if cursor else 0
 
+        if search_cache.enabled:
+            cache_key = search_cache.key(search_data, limit, offset, rank, pagination, after_id, facets=facets,
+                                         total=total)
+            cache_version, cached = await search_cache.lookup(cache_key)
+            if cached is not None:
+                return cached
+
+        if search_engine.ready and not rank:
+
+            if pagination == "cursor":
+                books = search_engine.search(search_data, limit + 1, after_id=after_id)
+            else:
+                books = search_engine.search(search_data, limit, offset)
+
+        else:
+
+            stmt = search_query(search_data, rank)
+
+            if pagination == "cursor":
+                # Keyset pagination on the primary key: every page is an index range scan, however deep.
+                stmt = stmt.filter(Book.c.id > after_id).order_by(Book.c.id).limit(limit + 1)
+            else:
+                stmt = stmt.limit(limit).offset(offset)
+
+            async def run_search():
+                result = await session.execute(stmt)
+                return result.mappings().all()
+
+            books = await search_reads.do(
+                session, SearchCache.key(search_data, limit, offset, rank, pagination, after_id), run_search
+            )
+
+        if pagination == "cursor":
+            next_cursor = encode_cursor(books[limit - 1]["id"]) if len(books) > limit else None
+            page = {"books": [dict(book) for book in books[:limit]], "limit": limit, "next_cursor": next_cursor}
+        else:
+            page = {"books": [dict(book) for book in books], "limit": limit, "offset": offset}
+
+        if facets or total:
+            summary_key = json.dumps({**SearchCache.filters(search_data), "facets": facets, "total": total},
+                                     sort_keys=True)
+            page.update(await search_reads.do(
+                session, summary_key, lambda: search_summary(session, search_data, facets, total)
+            ))
+
+        if search_cache.enabled:
+            await search_cache.store(cache_version, cache_key, page)
+
+        return page
+
+    except HTTPException as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e.detail))
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+def owned_book_target(book_id: int, user: User):
+
+    # One row with the user's ownership flag when the book exists, no row when it does not.
+    owned = select(UserBooks.c.id).where(UserBooks.c.book_id == Book.c.id, UserBooks.c.user_id == user.id).exists()
+    return select(Book.c.id, owned.label("owned")).where(Book.c.id == book_id).cte("target")
+
+def raise_for_ownership(outcome):
+
+    if outcome is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+    if not outcome.owned:
+        raise HTTPException(status_code=403, detail="You do not own this book")
+
+async def check_book_ownership(session: AsyncSession, book_id: int, user: User):
+
+    target = owned_book_target(book_id, user)
+    result = await session.execute(select(target.c.owned))
+    raise_for_ownership(result.fetchone())
+
 async def delete_book_by_id(bookID: int, session: AsyncSession, user: User):
 
     try:
 
-        book_query = select(Book.c.id).where(Book.c.id == bookID)
-        result = await session.execute(book_query)
-        book_exists = result.scalar_one_or_none()
+        # Existence, ownership and both deletes in one statement; the outcome row tells 404 from 403.
+        target = owned_book_target(bookID, user)
 
-        if not book_exists:
-            raise HTTPException(status_code=404, detail="Book not found")
+        delete_user_books = delete(UserBooks).where(
+            UserBooks.c.book_id == target.c.id,
+            UserBooks.c.user_id == user.id,
+            target.c.owned
+        ).returning(UserBooks.c.book_id).cte("unlinked")
 
-        user_book_query = select(UserBooks.c.book_id).where(
-            UserBooks.c.book_id == bookID,
-            UserBooks.c.user_id == user.id
-        )
-        result = await session.execute(user_book_query)
-        user_has_book = result.scalar_one_or_none()
+        delete_book_stmt = delete(Book).where(
+            Book.c.id == target.c.id,
+            target.c.owned
+        ).returning(Book.c.id).cte("deleted")
 
-        if not user_has_book:
-            raise HTTPException(status_code=403, detail="You do not own this book")
+        stmt = select(
+            target.c.owned,
+            select(delete_book_stmt.c.id).exists().label("deleted")
+        ).add_cte(delete_user_books)
 
-        delete_user_books = delete(UserBooks).where(
-            UserBooks.c.book_id == bookID,
-            UserBooks.c.user_id == user.id
-        )
-        await session.execute(delete_user_books)
+        result = await session.execute(stmt)
+        outcome = result.fetchone()
+
+        raise_for_ownership(outcome)
+
+        # The book was deleted by someone else between the snapshot and the row lock.
+        if not outcome.deleted:
+            raise HTTPException(status_code=404, detail="Book not found")
 
-        delete_book_stmt = delete(Book).where(Book.c.id == bookID)
-        await session.execute(delete_book_stmt)
+        search_engine.stage(session, "remove", bookID)
+        search_cache.stage(session)
+        book_reads.stage(session)
+        search_reads.stage(session)
+        invalidation_bus.publish(session, "books", ids=[bookID])
 
         await session.commit()
         return {"message": "Book deleted successfully"}
@@ -222,56 +505,46 @@ async def update_book_by_id(book_id: int, session: AsyncSession, user: User, boo
     try:
 
         current_year = datetime.now().year
-        if not (1800 <= book_data.published_years <= current_year):
+        if book_data.published_years is not None and not (1800 <= book_data.published_years <= current_year):
             raise ValueError(f"published_years must be between 1800 and {current_year}")
 
-        stmt = select(Book).where(Book.c.id == book_id)
-        result = await session.execute(stmt)
-        book = result.scalar_one_or_none()
+        changes = book_data.dict(exclude_unset=True)
 
-        if not book:
-            raise HTTPException(status_code=404, detail="Book not found")
+        index_fields = {
+            key: value for key, value in changes.items()
+            if key in ("title", "pages", "publisher", "published_years", "language", "isbn")
+        }
 
-        user_book_query = select(UserBooks).where(
-            UserBooks.c.book_id == book_id,
-            UserBooks.c.user_id == user.id
-        )
-        result = await session.execute(user_book_query)
-        user_has_book = result.scalar_one_or_none()
+        # Request errors found before the UPDATE still come after 404/403, so those are checked first for them.
+        error = None
 
-        if not user_has_book:
-            raise HTTPException(status_code=403, detail="You do not own this book")
-
-        if 'genre' in book_data.dict(exclude_unset=True):
+        if 'genre' in changes:
             genre_name = book_data.genre
-            genre_stmt = select(Genres.c.id).where(Genres.c.genre_name == genre_name)
-            result = await session.execute(genre_stmt)
-            genre = result.scalar_one_or_none()
+            index_fields["genre_name"] = genre_name
+            genre = await genre_cache.get_id(session, genre_name)
 
             if not genre:
-                raise HTTPException(status_code=400, detail=f"Genre '{genre_name}' not found")
+                error = HTTPException(status_code=400, detail=f"Genre '{genre_name}' not found")
             else:
-                genre_id = genre
-
-            book_data.genre = genre_id
+                book_data.genre = genre
 
-        if 'author' in book_data.dict(exclude_unset=True):
+        if error is None and 'author' in changes:
             author_name = book_data.author
+            index_fields["author_firstName"] = author_name.author_firstName
+            index_fields["author_lastName"] = author_name.author_lastName
 
-            author_stmt = select(Authors.c.id).where(
-                Authors.c.author_lastName == author_name.author_lastName,
-                Authors.c.author_firstName == author_name.author_firstName
-            )
-            result = await session.execute(author_stmt)
-            author = result.scalar_one_or_none()
+            author = await author_cache.get_id(session, (author_name.author_firstName, author_name.author_lastName))
 
             if not author:
-                insert_stmt = insert(Authors).values(
+                insert_stmt = upsert_authors().values(
                     author_lastName=author_name.author_lastName,
                     author_firstName=author_name.author_firstName,
                 ).returning(Authors.c.id)
                 result = await session.execute(insert_stmt)
                 author_id = result.scalar_one()
+                author_cache.put_after_commit(
+                    session, (author_name.author_firstName, author_name.author_lastName), author_id
+                )
             else:
                 author_id = author
 
@@ -281,15 +554,36 @@ async def update_book_by_id(book_id: int, session: AsyncSession, user: User, boo
         for key, value in book_data.dict(exclude_unset=True).items():
             if key in Book.columns:
                 update_data[key] = value
-            else:
-                raise HTTPException(status_code=400, detail=f"Invalid field {key} for book")
+            elif error is None:
+                error = HTTPException(status_code=400, detail=f"Invalid field {key} for book")
+
+        if error is None and not update_data:
+            error = HTTPException(status_code=400, detail="No valid fields to update")
+
+        if error is not None:
+            await check_book_ownership(session, book_id, user)
+            raise error
 
-        if not update_data:
-            raise HTTPException(status_code=400, detail="No valid fields to update")
+        target = owned_book_target(book_id, user)
 
-        stmt = update(Book).where(Book.c.id == book_id).values(update_data)
+        stmt = update(Book).where(
+            Book.c.id == target.c.id,
+            target.c.owned
+        ).values({**update_data, "version": Book.c.version + 1}).returning(Book.c.id).cte("updated")
 
-        await session.execute(stmt)
+        result = await session.execute(select(target.c.owned, select(stmt.c.id).exists().label("updated")))
+        outcome = result.fetchone()
+
+        raise_for_ownership(outcome)
+
+        if not outcome.updated:
+            raise HTTPException(status_code=404, detail="Book not found")
+
+        search_engine.stage(session, "update", book_id, index_fields)
+        search_cache.stage(session)
+        book_reads.stage(session)
+        search_reads.stage(session)
+        invalidation_bus.publish(session, "books", ids=[book_id])
         await session.commit()
         return {"message": "Book updated successfully"}
 
@@ -301,80 +595,107 @@ async def update_book_by_id(book_id: int, session: AsyncSession, user: User, boo
         await session.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to update book: {e}")
 
-async def process_json(content, session, user):
+def build_json_book(book_data) -> BookBase:
+
     try:
-        books_data = json.loads(content.decode("utf-8"))
+        return BookBase(**book_data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid book data: {e}")
 
-        if isinstance(books_data, dict):
-            books_data = [books_data]
+def build_csv_book(book_data) -> BookBase:
 
-        if not isinstance(books_data, list):
-            raise HTTPException(status_code=400, detail="Invalid JSON format. Expected a list of books.")
+    try:
+        return BookBase(
+            title=book_data["Title"],
+            author=AuthorBase(
+                author_firstName=book_data["Author"].split()[0],
+                author_lastName=" ".join(book_data["Author"].split()[1:])
+            ),
+            genre=book_data["Genre"],
+            pages=int(book_data["Pages"]),
+            publisher=book_data["Publisher"],
+            published_years=int(book_data["Year"]),
+            language=book_data["Language"],
+            isbn=book_data["ISBN"]
+        )
 
-        created_books = []
+    except ValidationError as e:
 
-        for book_data in books_data:
+        raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
 
-            try:
-                book = BookBase(**book_data)
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Invalid book data: {e}")
+def parse_json_books(books_data):
 
-            book_creation_response = await create_book(session=session, user=user, book_data=book)
-            created_books.append(book_creation_response)
+    for book_data in books_data:
+        yield build_json_book(book_data)
 
-        return {"message": f"{len(created_books)} books created successfully"}
+def parse_csv_books(reader):
 
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid JSON format")
-    except HTTPException as e:
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+    for book_data in reader:
+        yield build_csv_book(book_data)
 
-async def process_csv(content, session, user):
-    try:
+def get_import_file_type(filename: str) -> str:
 
-        content_str = content.decode("utf-8")
+    if filename.endswith(".csv"):
+        return "csv"
 
-        csv_file = StringIO(content_str)
+    if filename.endswith((".json", ".ndjson")):
+        return "json"
 
-        reader = csv.DictReader(csv_file)
-        books_data = [row for row in reader]
+    raise HTTPException(status_code=400, detail="Unsupported file type. Only CSV, JSON and NDJSON are allowed.")
 
-        if not books_data:
-            raise HTTPException(status_code=400, detail="CSV is empty or invalid format.")
+def parse_books_file(fileobj, file_type: str):
 
-        created_books = []
+    if file_type == "csv":
+        return parse_csv_books(iter_csv_rows(fileobj))
 
-        for book_data in books_data:
-            try:
-                book_base_data = BookBase(
-                    title=book_data["Title"],
-                    author=AuthorBase(
-                        author_firstName=book_data["Author"].split()[0],
-                        author_lastName=" ".join(book_data["Author"].split()[1:])
-                    ),
-                    genre=book_data["Genre"],
-                    pages=int(book_data["Pages"]),
-                    publisher=book_data["Publisher"],
-                    published_years=int(book_data["Year"]),
-                    language=book_data["Language"],
-                    isbn=book_data["ISBN"]
-                )
+    return parse_json_books(iter_json_objects(fileobj))
+
+def parse_books_file_leniently(fileobj, file_type: str, skip_rows: int = 0):
+
+    # Yields (row_number, raw_row, book, error) so a bad row can be rejected without stopping the import.
+    if file_type == "csv":
+        rows, build_book = iter_csv_rows(fileobj), build_csv_book
+    else:
+        rows, build_book = iter_json_objects(fileobj), build_json_book
+
+    for row_number, book_data in enumerate(rows, start=1):
+
+        if row_number <= skip_rows:
+            continue
 
-                book_creation_response = await create_book(session=session, user=user, book_data=book_base_data)
-                created_books.append(book_creation_response)
+        try:
+            yield row_number, book_data, build_book(book_data), None
+        except HTTPException as e:
+            yield row_number, book_data, None, str(e.detail)
+        except Exception as e:
+            yield row_number, book_data, None, f"Invalid book data: {e!r}"
 
-            except ValidationError as e:
+async def process_json(file, session, user):
+    try:
+        created_books = await import_books(session, user, parse_json_books(iter_json_objects(file.file)))
 
-                raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+        return {"message": f"{created_books} books created successfully"}
 
-        return {"message": f"{len(created_books)} books created successfully"}
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid JSON format")
+    except HTTPException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+
+async def process_csv(file, session, user):
+    try:
+
+        created_books = await import_books(session, user, parse_csv_books(iter_csv_rows(file.file)))
+
+        if not created_books:
+            raise HTTPException(status_code=400, detail="CSV is empty or invalid format.")
+
+        return {"message": f"{created_books} books created successfully"}
 
     except csv.Error as e:
         raise HTTPException(status_code=400, detail=f"CSV format error: {str(e)}")
     except HTTPException as e:
         raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
\ No newline at end of file
@@ -4,4 +4,44 @@ from dotenv import load_dotenv
 load_dotenv()
 
 jwt_secret = os.getenv('JWT_SECRET')
-jwt_algorithm = os.getenv('JWT_ALGORITHM')
\ No newline at end of file
+jwt_algorithm = os.getenv('JWT_ALGORITHM')
+
+import_batch_size = int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+import_chunk_size = int(os.getenv('IMPORT_CHUNK_SIZE', 64 * 1024))
+import_job_concurrency = int(os.getenv('IMPORT_JOB_CONCURRENCY', 2))
+import_spool_dir = os.getenv('IMPORT_SPOOL_DIR')
+import_job_stale_seconds = int(os.getenv('IMPORT_JOB_STALE_SECONDS', 300))
+
+genre_cache_ttl = float(os.getenv('GENRE_CACHE_TTL', 300))
+author_cache_size = int(os.getenv('AUTHOR_CACHE_SIZE', 10000))
+
+invalidation_bus_enabled = os.getenv('INVALIDATION_BUS', 'false').lower() in ('1', 'true', 'yes', 'on')
+invalidation_channel = os.getenv('INVALIDATION_CHANNEL', 'cache_invalidation')
+invalidation_gap_timeout = float(os.getenv('INVALIDATION_GAP_TIMEOUT', 5))
+invalidation_max_backoff = float(os.getenv('INVALIDATION_MAX_BACKOFF', 30))
+
+# "memory" serves /books/search from a per-worker index, about 472 bytes per book (90 MiB for 200k books).
+# Only other workers' invalidation messages keep it current, so it needs INVALIDATION_BUS=true.
+search_backend = os.getenv('SEARCH_BACKEND', 'database')
+
+# The memory backend keeps its catalog version per worker, so it needs the invalidation bus to hear about
+# writes on other workers; without the bus, results are only cached in a shared store (redis).
+search_cache_backend = os.getenv('SEARCH_CACHE_BACKEND', 'memory' if invalidation_bus_enabled else 'off')
+search_cache_size = int(os.getenv('SEARCH_CACHE_SIZE', 1000))
+search_cache_ttl = float(os.getenv('SEARCH_CACHE_TTL', 60))
+search_cache_url = os.getenv('SEARCH_CACHE_URL', 'redis://localhost:6379/0')
+search_exact_count_limit = int(os.getenv('SEARCH_EXACT_COUNT_LIMIT', 10000))
+search_facet_limit = int(os.getenv('SEARCH_FACET_LIMIT', 20))
+
+user_cache_ttl = float(os.getenv('USER_CACHE_TTL', 60))
+user_cache_size = int(os.getenv('USER_CACHE_SIZE', 10000))
+
+bcrypt_rounds = int(os.getenv('BCRYPT_ROUNDS', 12))
+password_hash_concurrency = int(os.getenv('PASSWORD_HASH_CONCURRENCY', min(4, os.cpu_count() or 1)))
+
+request_timing_headers = os.getenv('REQUEST_TIMING_HEADERS', 'false').lower() in ('1', 'true', 'yes', 'on')
+query_repeat_warn_threshold = int(os.getenv('QUERY_REPEAT_WARN_THRESHOLD', 0))
+
+book_cache_control = os.getenv('BOOK_CACHE_CONTROL', 'no-cache')
+book_batch_max = int(os.getenv('BOOK_BATCH_MAX', 100))
+export_batch_size = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
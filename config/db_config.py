@@ -1,12 +1,22 @@
 import os
+import time
+import asyncio
+import logging
+
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, replace
 from dotenv import load_dotenv
+from fastapi import Request
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import MetaData
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import MetaData, text
 
 metaData = MetaData()
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 db_host = os.getenv("DB_HOST")
@@ -16,9 +26,249 @@ db_user = os.getenv("DB_USER")
 db_password = os.getenv("DB_PASSWORD")
 
 
-DATABASE_URL = f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:{db_port}/{db_database}"
+def env_bool(name: str, default: bool) -> bool:
+
+    value = os.getenv(name)
+    return default if value is None else value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+
+    host: str
+    port: str
+    database: str
+    user: str
+    password: str
+    echo: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_pre_ping: bool = False
+    pool_recycle: int = -1
+    pool_warmup: bool = True
+    statement_cache_size: int = 100
+    replica_hosts: tuple = ()
+    replica_policy: str = "round_robin"
+    replica_health_interval: float = 5.0
+    replica_max_lag: float = 30.0
+    read_your_writes_seconds: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "DatabaseSettings":
+
+        return cls(
+            host=db_host,
+            port=db_port,
+            database=db_database,
+            user=db_user,
+            password=db_password,
+            echo=env_bool("DB_ECHO", False),
+            pool_size=int(os.getenv("DB_POOL_SIZE", 5)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 10)),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+            pool_pre_ping=env_bool("DB_POOL_PRE_PING", False),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", -1)),
+            pool_warmup=env_bool("DB_POOL_WARMUP", True),
+            statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100)),
+            replica_hosts=tuple(host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()),
+            replica_policy=os.getenv("DB_REPLICA_POLICY", "round_robin"),
+            replica_health_interval=float(os.getenv("DB_REPLICA_HEALTH_INTERVAL", 5)),
+            replica_max_lag=float(os.getenv("DB_REPLICA_MAX_LAG", 30)),
+            read_your_writes_seconds=float(os.getenv("READ_YOUR_WRITES_SECONDS", 5)),
+        )
+
+    def for_replica(self, host: str) -> "DatabaseSettings":
+
+        # Replicas share credentials, database name and pool sizing with the primary; "host" or "host:port".
+        replica_host, _, replica_port = host.partition(":")
+        return replace(self, host=replica_host, port=replica_port or self.port, replica_hosts=())
+
+    @property
+    def url(self) -> str:
+
+        return f"postgresql+asyncpg://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+
+    # Records how long checkouts take, including the time spent waiting for a free connection.
+    observers = []
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            for observe in self.observers:
+                observe(waited)
+
+    def stats(self) -> dict:
+
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "checkouts": self.checkouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "max_wait_seconds": round(self.max_wait_seconds, 6),
+        }
+
+
+def build_engine(settings: DatabaseSettings) -> AsyncEngine:
+
+    # asyncpg's statement cache and SQLAlchemy's prepared statement cache are sized together;
+    # set DB_STATEMENT_CACHE_SIZE=0 behind pgbouncer in transaction mode.
+    return create_async_engine(
+        settings.url,
+        echo=settings.echo,
+        poolclass=TimedQueuePool,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_pre_ping=settings.pool_pre_ping,
+        pool_recycle=settings.pool_recycle,
+        connect_args={
+            "statement_cache_size": settings.statement_cache_size,
+            "prepared_statement_cache_size": settings.statement_cache_size,
+        },
+    )
+
+
+async def warm_pool(engine: AsyncEngine, connections: int):
+
+    # Opens the connections concurrently and holds them together, so each one is a separate pool entry.
+    async with AsyncExitStack() as stack:
+        await asyncio.gather(*(stack.enter_async_context(engine.connect()) for _ in range(connections)))
+
+
+class Replica:
+
+    def __init__(self, settings: DatabaseSettings):
+
+        self.name = f"{settings.host}:{settings.port}"
+        self.engine = build_engine(settings)
+        self.session_factory = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.healthy = False
+        self.lag = None
+
+
+class ReplicaSet:
+
+    # Replicas start unhealthy, so reads stay on the primary until the first health check passes.
+    def __init__(self, settings: list, policy: str = "round_robin", health_interval: float = 5.0,
+                 max_lag: float = 30.0, health_timeout: float = 2.0):
+
+        if policy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica policy '{policy}'")
+
+        self.replicas = [Replica(replica_settings) for replica_settings in settings]
+        self.policy = policy
+        self.health_interval = health_interval
+        self.max_lag = max_lag
+        self.health_timeout = health_timeout
+        self._next = 0
+        self._task = None
+
+    def choose(self):
+
+        healthy = [replica for replica in self.replicas if replica.healthy]
+
+        if not healthy:
+            return None
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+        self._next += 1
+        start = self._next % len(healthy)
+        healthy = healthy[start:] + healthy[:start]
+
+        if self.policy == "least_connections":
+            return min(healthy, key=lambda replica: replica.engine.pool.checkedout())
+
+        return healthy[0]
+
+    async def check(self, replica: Replica):
+
+        # Lag is only reported by a server in recovery; a primary used as a replica reports none.
+        query = text(
+            "SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) WHERE pg_is_in_recovery()"
+        )
+
+        async def probe():
+            async with replica.engine.connect() as connection:
+                return await connection.scalar(query)
+
+        try:
+            lag = await asyncio.wait_for(probe(), self.health_timeout)
+            healthy = lag is None or lag <= self.max_lag
+            replica.lag = float(lag) if lag is not None else None
+        except Exception as e:
+            healthy = False
+            logger.debug("Replica %s health check failed: %s", replica.name, e)
+
+        if healthy != replica.healthy:
+            logger.warning("Replica %s is now %s", replica.name, "healthy" if healthy else "unhealthy")
+        replica.healthy = healthy
+
+    async def check_all(self):
+
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def _monitor(self):
+
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_all()
+
+    async def start(self):
+
+        if self.replicas and self._task is None:
+            await self.check_all()
+            self._task = asyncio.create_task(self._monitor())
+
+    async def stop(self):
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> list:
+
+        return [
+            {"name": replica.name, "healthy": replica.healthy, "lag": replica.lag, **replica.engine.pool.stats()}
+            for replica in self.replicas
+        ]
+
+
+def get_pool_stats() -> dict:
+
+    return {**engine.pool.stats(), "replicas": read_replicas.stats()}
+
+
+db_settings = DatabaseSettings.from_env()
+
+DATABASE_URL = db_settings.url
+
+engine = build_engine(db_settings)
 
 async_session = sessionmaker(
     engine,
@@ -28,6 +278,36 @@ async_session = sessionmaker(
 
 metadata = MetaData()
 
+read_replicas = ReplicaSet(
+    [db_settings.for_replica(host) for host in db_settings.replica_hosts],
+    db_settings.replica_policy,
+    db_settings.replica_health_interval,
+    db_settings.replica_max_lag,
+)
+
+PRIMARY_PIN_COOKIE = "read_primary_until"
+
 async def get_session():
     async with async_session() as session:
         yield session
+
+
+def pinned_to_primary(request: Request) -> bool:
+
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def get_read_session_factory(request: Request):
+
+    # A client that wrote recently keeps reading from the primary, so it sees its own changes.
+    replica = None if pinned_to_primary(request) else read_replicas.choose()
+    return replica.session_factory if replica is not None else async_session
+
+
+async def get_read_session(request: Request):
+
+    async with get_read_session_factory(request)() as session:
+        yield session
@@ -0,0 +1,28 @@
+"""UserBooksMerge lookup index
+
+Revision ID: a7d3e5f9c2b4
+Revises: f2a6c8e41b90
+Create Date: 2026-10-18 21:31:46.905127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e5f9c2b4'
+down_revision: Union[str, None] = 'f2a6c8e41b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_UserBooksMerge_book_id_user_id', 'UserBooksMerge', ['book_id', 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_UserBooksMerge_book_id_user_id', table_name='UserBooksMerge')
@@ -0,0 +1,52 @@
+"""Resumable imports
+
+Revision ID: b3e8f0c61d27
+Revises: 7d41c2a9e3b5
+Create Date: 2026-10-18 11:40:07.918263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8f0c61d27'
+down_revision: Union[str, None] = '7d41c2a9e3b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ImportJobs', sa.Column('resumable', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column('ImportJobs', sa.Column('file_hash', sa.String(), nullable=True))
+    op.add_column('ImportJobs', sa.Column('checkpoint_offset', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('ImportJobs', sa.Column('attempt', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('ImportJobs', sa.Column('rows_rejected', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('ImportJobs', sa.Column('updated_at', sa.TIMESTAMP(), nullable=True))
+    op.create_index(op.f('ix_ImportJobs_file_hash'), 'ImportJobs', ['file_hash'], unique=False)
+    op.create_table('ImportRejects',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('job_id', sa.BigInteger(), nullable=False),
+    sa.Column('row_number', sa.BigInteger(), nullable=False),
+    sa.Column('error', sa.String(), nullable=False),
+    sa.Column('row', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['job_id'], ['ImportJobs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ImportRejects_job_id'), 'ImportRejects', ['job_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ImportRejects_job_id'), table_name='ImportRejects')
+    op.drop_table('ImportRejects')
+    op.drop_index(op.f('ix_ImportJobs_file_hash'), table_name='ImportJobs')
+    op.drop_column('ImportJobs', 'updated_at')
+    op.drop_column('ImportJobs', 'rows_rejected')
+    op.drop_column('ImportJobs', 'attempt')
+    op.drop_column('ImportJobs', 'checkpoint_offset')
+    op.drop_column('ImportJobs', 'file_hash')
+    op.drop_column('ImportJobs', 'resumable')
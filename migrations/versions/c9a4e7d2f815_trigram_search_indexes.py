@@ -0,0 +1,43 @@
+"""Trigram search indexes
+
+Revision ID: c9a4e7d2f815
+Revises: b3e8f0c61d27
+Create Date: 2026-10-18 13:05:52.640418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9a4e7d2f815'
+down_revision: Union[str, None] = 'b3e8f0c61d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRIGRAM_INDEXES = [
+    ('ix_Book_title_trgm', 'Book', 'title'),
+    ('ix_Book_isbn_trgm', 'Book', 'isbn'),
+    ('ix_Authors_author_firstName_trgm', 'Authors', 'author_firstName'),
+    ('ix_Authors_author_lastName_trgm', 'Authors', 'author_lastName'),
+    ('ix_Genres_genre_name_trgm', 'Genres', 'genre_name'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, table_name, column_name in TRIGRAM_INDEXES:
+        op.create_index(
+            index_name, table_name, [column_name], unique=False,
+            postgresql_using='gin', postgresql_ops={column_name: 'gin_trgm_ops'}
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for index_name, table_name, column_name in reversed(TRIGRAM_INDEXES):
+        op.drop_index(index_name, table_name=table_name)
@@ -0,0 +1,41 @@
+"""unique Authors name
+
+Revision ID: d5c8a1f3e7b2
+Revises: a7d3e5f9c2b4
+Create Date: 2026-10-18 23:05:12.418530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5c8a1f3e7b2'
+down_revision: Union[str, None] = 'a7d3e5f9c2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Duplicate authors are interchangeable, so books are moved to the lowest id of each name and the rest dropped.
+    op.execute(sa.text(
+        'CREATE TEMPORARY TABLE author_duplicates AS '
+        'SELECT id, min(id) OVER (PARTITION BY "author_firstName", "author_lastName") AS keep_id FROM "Authors"'
+    ))
+    op.execute(sa.text('DELETE FROM author_duplicates WHERE id = keep_id'))
+    op.execute(sa.text(
+        'UPDATE "Book" SET author = author_duplicates.keep_id FROM author_duplicates '
+        'WHERE "Book".author = author_duplicates.id'
+    ))
+    op.execute(sa.text('DELETE FROM "Authors" USING author_duplicates WHERE "Authors".id = author_duplicates.id'))
+    op.execute(sa.text('DROP TABLE author_duplicates'))
+
+    op.create_unique_constraint('uq_Authors_author_name', 'Authors', ['author_firstName', 'author_lastName'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_Authors_author_name', 'Authors', type_='unique')
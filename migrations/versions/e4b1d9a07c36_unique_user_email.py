@@ -0,0 +1,34 @@
+"""Unique user email
+
+Revision ID: e4b1d9a07c36
+Revises: c9a4e7d2f815
+Create Date: 2026-10-18 21:02:17.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b1d9a07c36'
+down_revision: Union[str, None] = 'c9a4e7d2f815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    duplicates = op.get_bind().execute(
+        sa.text('SELECT email FROM "User" GROUP BY email HAVING count(*) > 1 LIMIT 10')
+    ).scalars().all()
+    if duplicates:
+        raise RuntimeError(f'Duplicate User emails must be merged before this migration: {duplicates}')
+
+    op.create_index(op.f('ix_User_email'), 'User', ['email'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_User_email'), table_name='User')
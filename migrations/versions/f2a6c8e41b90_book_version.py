@@ -0,0 +1,28 @@
+"""Book version
+
+Revision ID: f2a6c8e41b90
+Revises: e4b1d9a07c36
+Create Date: 2026-10-18 21:14:03.552871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a6c8e41b90'
+down_revision: Union[str, None] = 'e4b1d9a07c36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('Book', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('Book', 'version')
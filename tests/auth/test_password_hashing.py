@@ -0,0 +1,49 @@
+import sys
+import os
+import pytest
+
+from httpx import AsyncClient
+from sqlalchemy import select
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import auth.utils
+from auth.models import User
+from auth.utils import hash_password, check_password, password_cost, password_executor
+
+async def stored_password(session, email: str) -> str:
+
+    result = await session.execute(select(User.c.password).where(User.c.email == email))
+    password = result.scalar_one()
+    await session.rollback()
+    return password
+
+@pytest.mark.asyncio
+async def test_hash_and_check_password_off_the_loop(monkeypatch):
+
+    monkeypatch.setattr(auth.utils, "bcrypt_rounds", 4)
+
+    hashed = await hash_password("password123")
+
+    assert password_cost(hashed) == 4
+    assert await check_password("password123", hashed)
+    assert not await check_password("password124", hashed)
+
+    # A lifespan shutdown must not leave the next one unable to hash.
+    password_executor.shutdown()
+    assert await check_password("password123", hashed)
+
+@pytest.mark.asyncio
+async def test_login_rehashes_when_cost_changes(async_client: AsyncClient, session, monkeypatch):
+
+    credentials = {"email": "testuser@example.com", "password": "password123"}
+    assert password_cost(await stored_password(session, credentials["email"])) == auth.utils.bcrypt_rounds
+
+    monkeypatch.setattr(auth.utils, "bcrypt_rounds", 4)
+
+    response = await async_client.post("/auth/login", json=credentials)
+    assert response.status_code == 200
+    assert password_cost(await stored_password(session, credentials["email"])) == 4
+
+    response = await async_client.post("/auth/login", json={**credentials, "password": "wrongpassword1"})
+    assert response.status_code == 401
@@ -0,0 +1,52 @@
+import sys
+import os
+import jwt
+import pytest
+
+from httpx import AsyncClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from config.app_config import jwt_secret, jwt_algorithm
+from auth.cache import user_cache, invalidate_user
+
+@pytest.mark.asyncio
+async def test_register_duplicate_email(async_client: AsyncClient, session):
+
+    user_data = {
+        "email": "duplicate@example.com",
+        "password": "password123",
+        "confirmPassword": "password123"
+    }
+
+    response = await async_client.post("/auth/register", json=user_data)
+    assert response.status_code == 200
+
+    response = await async_client.post("/auth/register", json=user_data)
+    assert response.status_code == 400
+    assert response.json().get("detail") == "User with this email already exists"
+
+
+@pytest.mark.asyncio
+async def test_current_user_is_cached_by_token(async_client: AsyncClient, session):
+
+    response = await async_client.post("/auth/login", json={"email": "duplicate@example.com", "password": "password123"})
+    assert response.status_code == 200
+
+    token = async_client.cookies.get("access_token")
+    payload = jwt.decode(token, jwt_secret, algorithms=[jwt_algorithm])
+    assert payload["sub"] == "duplicate@example.com"
+    assert payload["uid"] is not None
+
+    misses = user_cache.misses
+    hits = user_cache.hits
+
+    assert (await async_client.delete("/books/delete=0")).status_code == 404
+    assert (await async_client.delete("/books/delete=0")).status_code == 404
+
+    assert user_cache.misses == misses + 1
+    assert user_cache.hits == hits + 1
+    assert user_cache.get(token).id == payload["uid"]
+
+    invalidate_user(payload["uid"])
+    assert user_cache.get(token) is None
@@ -1,13 +1,15 @@
 import pytest
+import asyncio
 import os
 import sys
 
 from httpx import AsyncClient
-from sqlalchemy import insert
+from sqlalchemy import insert, select, func
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
 
-from books.models import Genres
+from books.models import Genres, Authors
+from books.cache import author_cache
 
 @pytest.mark.asyncio
 async def test_create_book_success(async_client: AsyncClient, session):
@@ -89,3 +91,31 @@ async def test_create_book_missing_data(async_client: AsyncClient, session):
     assert response.status_code == 422
     assert "detail" in response.json()
 
+
+@pytest.mark.asyncio
+async def test_concurrent_creates_share_one_new_author(async_client: AsyncClient, session):
+
+    author_cache.invalidate()
+
+    async def create(number):
+        return await async_client.post("/books/create", json={
+            "title": f"Concurrent Book {number}",
+            "author": {"author_firstName": "Ada", "author_lastName": "Concurrent"},
+            "genre": "Fantasy",
+            "pages": 100 + number,
+            "publisher": "Test Publisher",
+            "published_years": 2020,
+            "language": "English",
+            "isbn": f"77700000{number:02d}"
+        })
+
+    responses = await asyncio.gather(*(create(number) for number in range(4)))
+
+    assert [response.status_code for response in responses] == [200] * 4
+    assert len({response.json()["book_id"] for response in responses}) == 4
+
+    authors = await session.scalar(
+        select(func.count()).select_from(Authors).where(Authors.c.author_lastName == "Concurrent")
+    )
+    await session.rollback()
+    assert authors == 1
@@ -0,0 +1,57 @@
+import pytest
+import os
+import sys
+import csv
+import io
+import json
+import gzip
+
+from httpx import AsyncClient
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from books.models import Book
+from books.export import export_books
+from books.schemas import BookSearch
+
+@pytest.mark.asyncio
+async def test_export_formats(async_client: AsyncClient, session):
+
+    total = await session.scalar(select(func.count()).select_from(Book))
+    await session.rollback()
+
+    response = await async_client.get("/books/export", params={"title": "test book"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="books.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["id"], row["title"], row["author_lastName"]) for row in rows] == [("1", "Test Book", "Doe")]
+
+    response = await async_client.get("/books/export", params={"format": "ndjson"})
+    lines = response.text.splitlines()
+    assert len(lines) == total
+    assert [json.loads(line)["id"] for line in lines] == sorted(json.loads(line)["id"] for line in lines)
+
+    response = await async_client.get("/books/export", params={"format": "json", "gzip": "true"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(json.loads(response.content)) == total
+
+    response = await async_client.get("/books/export", params={"format": "json", "title": "no such title"})
+    assert json.loads(response.content) == []
+
+    response = await async_client.get("/books/export", params={"format": "xml"})
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_export_streams_in_batches(session):
+
+    # Every batch from the cursor is one chunk; the gzip stream decodes to the same document.
+    session_factory = async_sessionmaker(session.bind)
+    chunks = [chunk async for chunk in export_books(session_factory, BookSearch(), "json", batch_size=1)]
+    books = json.loads(b"".join(chunks))
+    assert len(chunks) == len(books) + 2
+
+    compressed = b"".join([chunk async for chunk in export_books(session_factory, BookSearch(), "json", True, 1)])
+    assert json.loads(gzip.decompress(compressed)) == books
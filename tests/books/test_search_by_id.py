@@ -32,6 +32,11 @@ async def test_get_book_by_id_success(async_client, session):
     assert data["data"]["title"] == "Test Book"
     assert "genre" in data["data"]
     assert "author" in data["data"]
+    assert data["data"]["genre"] == "Fantasy"
+    assert data["data"]["author"] == "Doe John"
+    assert list(data["data"]) == [
+        "id", "title", "author", "pages", "genre", "publisher", "published_years", "language", "isbn"
+    ]
 
 
 @pytest.mark.asyncio
@@ -41,3 +46,72 @@ async def test_get_book_by_id_not_found(async_client, session):
 
     assert response.status_code == 404
     assert response.json()["detail"] == "Book not found"
+
+@pytest.mark.asyncio
+async def test_conditional_get_book(async_client, session, query_budget):
+
+    await session.execute(insert(Genres).values(id=400, genre_name="Reference"))
+    await session.commit()
+
+    book_data = {
+        "title": "Cached Book",
+        "author": {"author_firstName": "Etag", "author_lastName": "Writer"},
+        "genre": "Reference",
+        "pages": 210,
+        "publisher": "Test Publisher",
+        "published_years": 2015,
+        "language": "English",
+        "isbn": "4440001112"
+    }
+
+    response = await async_client.post("/books/create", json=book_data)
+    book_id = response.json()["book_id"]
+
+    response = await async_client.get(f"/books/bookID={book_id}")
+
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag == f'"book-{book_id}-v1"'
+    assert response.headers["cache-control"] == "no-cache"
+    assert "version" not in response.json()["data"]
+
+    response = await async_client.get(f"/books/bookID={book_id}", headers={"If-None-Match": f'"other", W/{etag}'})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    query_budget(response, queries=1)
+
+    response = await async_client.patch(f"/books/books/{book_id}", json={"pages": 211, "published_years": 2015})
+    assert response.status_code == 200
+
+    response = await async_client.get(f"/books/bookID={book_id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"book-{book_id}-v2"'
+    assert response.json()["data"]["pages"] == 211
+
+@pytest.mark.asyncio
+async def test_get_books_batch_in_request_order(async_client, session, query_budget):
+
+    response = await async_client.get("/books/batch", params={"ids": "999999,1, 1"})
+
+    assert response.status_code == 200
+    query_budget(response, queries=1)
+    items = response.json()["data"]
+    assert [item["id"] for item in items] == [999999, 1, 1]
+    assert items[0] == {"id": 999999, "status": 404, "detail": "Book not found"}
+    assert items[1]["status"] == 200
+    assert items[1]["data"]["title"] == "Test Book"
+    assert items[1]["data"]["author"] == "Doe John"
+    assert items[2] == items[1]
+
+    response = await async_client.get("/books/batch?ids=1&ids=2")
+    assert [item["id"] for item in response.json()["data"]] == [1, 2]
+
+    response = await async_client.get("/books/batch", params={"ids": "1,abc"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid book id 'abc'"
+
+    response = await async_client.get("/books/batch", params={"ids": ",".join(map(str, range(1, 102)))})
+    assert response.status_code == 400
@@ -0,0 +1,91 @@
+import pytest
+import os
+import sys
+
+from sqlalchemy import insert, select
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+
+from books.models import Book, Authors, Genres
+from auth.models import User, UserBooks
+
+BOOK = {
+    "title": "Owned Book",
+    "author": {"author_firstName": "Owner", "author_lastName": "Person"},
+    "genre": "Ownership",
+    "pages": 100,
+    "publisher": "Test Publisher",
+    "published_years": 2010,
+    "language": "English",
+    "isbn": "6660001112"
+}
+
+async def insert_foreign_book(session) -> int:
+
+    user_id = (await session.execute(
+        insert(User).values(email="someone-else@example.com", password="x").returning(User.c.id)
+    )).scalar_one()
+    author_id = (await session.execute(
+        insert(Authors).values(author_firstName="Other", author_lastName="Owner").returning(Authors.c.id)
+    )).scalar_one()
+    book_id = (await session.execute(insert(Book).values(
+        title="Foreign Book", author=author_id, pages=10, genre=500, publisher="P", published_years=2000,
+        language="English", isbn="6660009999"
+    ).returning(Book.c.id))).scalar_one()
+    await session.execute(insert(UserBooks).values(user_id=user_id, book_id=book_id))
+    await session.commit()
+
+    return book_id
+
+@pytest.mark.asyncio
+async def test_update_and_delete_outcomes(async_client, session, query_budget):
+
+    await session.execute(insert(Genres).values(id=500, genre_name="Ownership"))
+    await session.commit()
+    foreign_id = await insert_foreign_book(session)
+
+    book_id = (await async_client.post("/books/create", json=BOOK)).json()["book_id"]
+
+    response = await async_client.patch(f"/books/books/{book_id}", json={"pages": 150})
+    assert response.status_code == 200
+    assert response.json() == {"message": "Book updated successfully"}
+    query_budget(response, queries=1, commits=1)
+
+    response = await async_client.get(f"/books/bookID={book_id}")
+    assert response.json()["data"]["pages"] == 150
+
+    response = await async_client.patch("/books/books/999999", json={"pages": 150})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Book not found"
+
+    response = await async_client.patch(f"/books/books/{foreign_id}", json={"pages": 150})
+    assert response.status_code == 403
+    assert response.json()["detail"] == "You do not own this book"
+
+    response = await async_client.patch(f"/books/books/{foreign_id}", json={"genre": "No Such Genre"})
+    assert response.status_code == 403
+
+    response = await async_client.patch(f"/books/books/{book_id}", json={"genre": "No Such Genre"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Genre 'No Such Genre' not found"
+
+    response = await async_client.patch(f"/books/books/{book_id}", json={})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No valid fields to update"
+
+    response = await async_client.delete(f"/books/delete={foreign_id}")
+    assert response.status_code == 403
+    assert response.json()["detail"] == "You do not own this book"
+
+    response = await async_client.delete(f"/books/delete={book_id}")
+    assert response.status_code == 200
+    assert response.json() == {"message": "Book deleted successfully"}
+    query_budget(response, queries=1, commits=1)
+
+    response = await async_client.delete(f"/books/delete={book_id}")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Book not found"
+
+    result = await session.execute(select(Book.c.id).where(Book.c.id.in_([book_id, foreign_id])))
+    assert result.scalars().all() == [foreign_id]
+    await session.rollback()
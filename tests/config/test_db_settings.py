@@ -0,0 +1,43 @@
+import sys
+import os
+import pytest
+
+from dataclasses import replace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from config.db_config import DatabaseSettings, build_engine, warm_pool
+
+def test_settings_from_env(monkeypatch):
+
+    monkeypatch.setenv("DB_POOL_SIZE", "12")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "true")
+    monkeypatch.setenv("DB_STATEMENT_CACHE_SIZE", "0")
+    monkeypatch.delenv("DB_ECHO", raising=False)
+
+    settings = DatabaseSettings.from_env()
+
+    assert settings.echo is False
+    assert settings.pool_size == 12
+    assert settings.max_overflow == 0
+    assert settings.pool_pre_ping is True
+    assert settings.statement_cache_size == 0
+    assert settings.pool_timeout == 30.0
+
+@pytest.mark.asyncio
+async def test_warm_pool_and_stats():
+
+    settings = replace(DatabaseSettings.from_env(), database=os.getenv("TEST_DB_NAME"), pool_size=3)
+    engine = build_engine(settings)
+
+    try:
+        await warm_pool(engine, settings.pool_size)
+        stats = engine.pool.stats()
+    finally:
+        await engine.dispose()
+
+    assert stats["checked_in"] == 3
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] == 3
+    assert stats["wait_seconds_total"] >= stats["max_wait_seconds"] > 0
@@ -0,0 +1,105 @@
+import sys
+import os
+import time
+import pytest
+
+from dataclasses import replace
+from httpx import AsyncClient
+from starlette.requests import Request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import app.main
+import config.db_config
+from config.db_config import DatabaseSettings, ReplicaSet, get_read_session, PRIMARY_PIN_COOKIE
+
+def replica_settings(port: str = None) -> DatabaseSettings:
+
+    settings = replace(DatabaseSettings.from_env(), database=os.getenv("TEST_DB_NAME"), pool_size=2)
+    return settings.for_replica(f"{settings.host}:{port or settings.port}")
+
+def request_with_cookies(cookies: dict) -> Request:
+
+    cookie = "; ".join(f"{name}={value}" for name, value in cookies.items())
+    return Request({"type": "http", "method": "GET", "headers": [(b"cookie", cookie.encode())]})
+
+async def read_session_bind(request: Request):
+
+    gen = get_read_session(request)
+    session = await gen.__anext__()
+    bind = session.bind
+    await gen.aclose()
+    return bind
+
+@pytest.mark.asyncio
+async def test_unhealthy_replica_is_skipped():
+
+    replicas = ReplicaSet([replica_settings(), replica_settings("1")], health_timeout=1)
+
+    try:
+        assert replicas.choose() is None
+
+        await replicas.check_all()
+        healthy, broken = replicas.replicas
+
+        assert healthy.healthy and not broken.healthy
+        assert {replicas.choose() for _ in range(4)} == {healthy}
+    finally:
+        await replicas.stop()
+
+@pytest.mark.asyncio
+async def test_round_robin_and_least_connections():
+
+    replicas = ReplicaSet([replica_settings(), replica_settings()])
+
+    try:
+        await replicas.check_all()
+        first, second = replicas.replicas
+
+        assert [replicas.choose() for _ in range(4)] == [second, first, second, first]
+
+        replicas.policy = "least_connections"
+        async with first.engine.connect():
+            assert [replicas.choose() for _ in range(3)] == [second, second, second]
+    finally:
+        await replicas.stop()
+
+@pytest.mark.asyncio
+async def test_read_session_routing(monkeypatch):
+
+    replicas = ReplicaSet([replica_settings()])
+    monkeypatch.setattr(config.db_config, "read_replicas", replicas)
+
+    try:
+        assert await read_session_bind(request_with_cookies({})) is config.db_config.engine
+
+        await replicas.check_all()
+        assert await read_session_bind(request_with_cookies({})) is replicas.replicas[0].engine
+
+        pinned = request_with_cookies({PRIMARY_PIN_COOKIE: time.time() + 60})
+        assert await read_session_bind(pinned) is config.db_config.engine
+
+        expired = request_with_cookies({PRIMARY_PIN_COOKIE: time.time() - 1})
+        assert await read_session_bind(expired) is replicas.replicas[0].engine
+    finally:
+        await replicas.stop()
+
+@pytest.mark.asyncio
+async def test_successful_write_pins_client_to_primary(async_client: AsyncClient, monkeypatch):
+
+    replicas = ReplicaSet([replica_settings()])
+    monkeypatch.setattr(app.main, "read_replicas", replicas)
+
+    try:
+        user_data = {"email": "pinned@example.com", "password": "password123", "confirmPassword": "password123"}
+        response = await async_client.post("/auth/register", json=user_data)
+
+        assert response.status_code == 200
+        assert float(response.cookies[PRIMARY_PIN_COOKIE]) > time.time()
+
+        response = await async_client.post("/auth/register", json=user_data)
+
+        assert response.status_code == 400
+        assert PRIMARY_PIN_COOKIE not in response.cookies
+    finally:
+        await replicas.stop()
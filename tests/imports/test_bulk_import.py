@@ -0,0 +1,107 @@
+import pytest
+import os
+import sys
+
+from httpx import AsyncClient
+from sqlalchemy import insert, select, func
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from books.models import Book, Genres, Authors
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+
+async def count_rows(session, query):
+
+    result = await session.execute(query)
+    count = result.scalar_one()
+    await session.rollback()
+
+    return count
+
+@pytest.mark.asyncio
+async def test_bulk_import_csv_success(async_client: AsyncClient, session):
+
+    genre = insert(Genres).values(id=100, genre_name="Fiction")
+
+    await session.execute(genre)
+    await session.commit()
+
+    books_before = await count_rows(session, select(func.count()).select_from(Book))
+
+    with open(os.path.join(ROOT_DIR, "multiple_books.csv"), "rb") as file:
+        response = await async_client.post("/books/bulk-import-books", files={"file": ("multiple_books.csv", file)})
+
+    assert response.status_code == 200
+    assert response.json()["message"] == "Books successfully imported"
+
+    books_after = await count_rows(session, select(func.count()).select_from(Book))
+    assert books_after - books_before == 2
+
+@pytest.mark.asyncio
+async def test_bulk_import_json_reuses_authors(async_client: AsyncClient, session):
+
+    with open(os.path.join(ROOT_DIR, "multiple_books.json"), "rb") as file:
+        response = await async_client.post("/books/bulk-import-books", files={"file": ("multiple_books.json", file)})
+
+    assert response.status_code == 200
+
+    with open(os.path.join(ROOT_DIR, "single_book.json"), "rb") as file:
+        response = await async_client.post("/books/bulk-import-books", files={"file": ("single_book.json", file)})
+
+    assert response.status_code == 200
+
+    query = select(func.count()).select_from(Authors).where(
+        Authors.c.author_firstName == "F. Scott",
+        Authors.c.author_lastName == "Fitzgerald"
+    )
+    assert await count_rows(session, query) == 1
+
+@pytest.mark.asyncio
+async def test_bulk_import_unknown_genre_is_atomic(async_client: AsyncClient, session):
+
+    books_before = await count_rows(session, select(func.count()).select_from(Book))
+
+    content = (
+        "Title,Author,Genre,Pages,Publisher,Year,Language,ISBN\n"
+        "Known Genre,Jane Roe,Fiction,100,Publisher,2000,English,111\n"
+        "Unknown Genre,Jane Roe,Cookbooks,100,Publisher,2000,English,222\n"
+    )
+
+    response = await async_client.post("/books/bulk-import-books", files={"file": ("books.csv", content.encode())})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Genre 'Cookbooks' not found"
+
+    books_after = await count_rows(session, select(func.count()).select_from(Book))
+    assert books_after == books_before
+
+@pytest.mark.asyncio
+async def test_bulk_import_ndjson(async_client: AsyncClient, session):
+
+    books_before = await count_rows(session, select(func.count()).select_from(Book))
+
+    lines = [
+        '{"title": "Line One", "author": {"author_firstName": "Ann", "author_lastName": "Lee"}, "genre": "Fiction", '
+        '"pages": 10, "publisher": "P", "published_years": 2001, "language": "English", "isbn": "1"}',
+        '{"title": "Line Two", "author": {"author_firstName": "Ann", "author_lastName": "Lee"}, "genre": "Fiction", '
+        '"pages": 20, "publisher": "P", "published_years": 2002, "language": "English", "isbn": "2"}',
+    ]
+
+    response = await async_client.post(
+        "/books/bulk-import-books",
+        files={"file": ("books.ndjson", "\n".join(lines).encode())}
+    )
+
+    assert response.status_code == 200
+
+    books_after = await count_rows(session, select(func.count()).select_from(Book))
+    assert books_after - books_before == 2
+
+@pytest.mark.asyncio
+async def test_bulk_import_invalid_json(async_client: AsyncClient, session):
+
+    response = await async_client.post("/books/bulk-import-books", files={"file": ("books.json", b'[{"title": ')})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid JSON format"
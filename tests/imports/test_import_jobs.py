@@ -0,0 +1,191 @@
+import pytest
+import os
+import sys
+import asyncio
+
+from httpx import AsyncClient
+from sqlalchemy import select, insert, update, func
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from datetime import timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from config.app_config import import_job_stale_seconds
+from books.models import Book, ImportJobs
+from books.jobs import ImportWorkerPool, QueuedImport
+from app.metrics import current_request_stats
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+
+RESUMABLE_CSV = (
+    "Title,Author,Genre,Pages,Publisher,Year,Language,ISBN\n"
+    "Resumable One,Mary Major,Fiction,100,Publisher,2000,English,301\n"
+    "Resumable Bad,Mary Major,Fiction,many,Publisher,2000,English,302\n"
+    "Resumable Two,Mary Major,Fiction,100,Publisher,2000,English,303\n"
+).encode()
+
+async def count_books(session):
+
+    result = await session.execute(select(func.count()).select_from(Book))
+    count = result.scalar_one()
+    await session.rollback()
+
+    return count
+
+async def wait_for_job(async_client: AsyncClient, job_id: int):
+
+    for _ in range(100):
+        response = await async_client.get(f"/books/import-jobs/{job_id}")
+        if response.json()["status"] not in ("queued", "running"):
+            return response
+        await asyncio.sleep(0.05)
+
+    raise AssertionError("Import job did not finish")
+
+@pytest.mark.asyncio
+async def test_background_import_completes(async_client: AsyncClient, session):
+
+    with open(os.path.join(ROOT_DIR, "multiple_books.json"), "rb") as file:
+        response = await async_client.post(
+            "/books/bulk-import-books?background=true",
+            files={"file": ("multiple_books.json", file)}
+        )
+
+    assert response.status_code == 200
+    assert response.json()["message"] == "Import job queued"
+
+    response = await wait_for_job(async_client, response.json()["job_id"])
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "completed"
+    assert data["rows_processed"] == 2
+    assert data["bytes_processed"] == data["bytes_total"]
+    assert data["errors"] == []
+
+@pytest.mark.asyncio
+async def test_background_import_reports_errors(async_client: AsyncClient, session):
+
+    response = await async_client.post(
+        "/books/bulk-import-books?background=true",
+        files={"file": ("broken.json", b'[{"title": ')}
+    )
+
+    response = await wait_for_job(async_client, response.json()["job_id"])
+
+    data = response.json()
+    assert data["status"] == "failed"
+    assert data["errors"] == ["Invalid JSON format"]
+
+@pytest.mark.asyncio
+async def test_import_job_not_found(async_client: AsyncClient, session):
+
+    response = await async_client.get("/books/import-jobs/999999")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Import job not found"
+
+
+@pytest.mark.asyncio
+async def test_resumable_import_rejects_bad_rows(async_client: AsyncClient, session):
+
+    books_before = await count_books(session)
+
+    response = await async_client.post(
+        "/books/bulk-import-books?resumable=true",
+        files={"file": ("resumable.csv", RESUMABLE_CSV)}
+    )
+
+    assert response.status_code == 200
+    job = response.json()["job"]
+    assert job["status"] == "completed"
+    assert job["rows_processed"] == 2
+    assert job["rows_rejected"] == 1
+    assert job["checkpoint_offset"] == 3
+    assert await count_books(session) - books_before == 2
+
+    response = await async_client.get(job["rejects_url"])
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0] == "row_number,error,row"
+    assert lines[1].startswith("2,")
+    assert len(lines) == 2
+
+@pytest.mark.asyncio
+async def test_resumable_import_resumes_from_checkpoint(async_client: AsyncClient, session):
+
+    books_before = await count_books(session)
+
+    response = await async_client.post(
+        "/books/bulk-import-books?resumable=true",
+        files={"file": ("resumable.csv", RESUMABLE_CSV)}
+    )
+
+    assert response.json()["message"] == "File already imported"
+    job_id = response.json()["job_id"]
+    assert await count_books(session) == books_before
+
+    stmt = update(ImportJobs).where(ImportJobs.c.id == job_id).values(status="failed", checkpoint_offset=2)
+    await session.execute(stmt)
+    await session.commit()
+
+    response = await async_client.post(
+        "/books/bulk-import-books?resumable=true",
+        files={"file": ("resumable.csv", RESUMABLE_CSV)}
+    )
+
+    job = response.json()["job"]
+    assert job["job_id"] == job_id
+    assert job["status"] == "completed"
+    assert job["checkpoint_offset"] == 3
+    assert await count_books(session) - books_before == 1
+
+@pytest.mark.asyncio
+async def test_worker_survives_failures_outside_the_job():
+
+    contexts = []
+
+    def broken_session_factory():
+        contexts.append(current_request_stats.get())
+        raise RuntimeError("database is down")
+
+    pool = ImportWorkerPool(1, broken_session_factory)
+
+    # Submitted from inside a request: the worker must not inherit its stats.
+    token = current_request_stats.set(object())
+    try:
+        for job_id in (1, 2):
+            pool.submit(QueuedImport(job_id, 0, None, "missing.csv", "csv", False))
+    finally:
+        current_request_stats.reset(token)
+
+    await asyncio.wait_for(pool._queue.join(), 5)
+    try:
+        assert contexts == [None, None]
+        assert not pool._workers[0].done()
+    finally:
+        await pool.stop()
+
+@pytest.mark.asyncio
+async def test_recover_interrupts_only_stale_jobs(session):
+
+    user_id = await session.scalar(select(ImportJobs.c.user_id).limit(1))
+    result = await session.execute(insert(ImportJobs).values([
+        {"user_id": user_id, "filename": "orphan.csv", "status": "running",
+         "updated_at": func.localtimestamp() - timedelta(seconds=import_job_stale_seconds + 60)},
+        {"user_id": user_id, "filename": "live.csv", "status": "running", "updated_at": func.localtimestamp()},
+    ]).returning(ImportJobs.c.id))
+    stale_id, fresh_id = result.scalars().all()
+    await session.commit()
+
+    # The fresh job may be running in another process; only the one nobody has touched is interrupted.
+    pool = ImportWorkerPool(1, async_sessionmaker(session.bind))
+    assert await pool.recover() == 1
+
+    result = await session.execute(select(ImportJobs).where(ImportJobs.c.id.in_([stale_id, fresh_id])))
+    jobs = {job.id: job for job in result}
+    await session.rollback()
+    assert jobs[stale_id].status == "interrupted" and jobs[stale_id].finished_at is not None
+    assert jobs[fresh_id].status == "running" and jobs[fresh_id].finished_at is None
@@ -0,0 +1,108 @@
+import pytest
+import os
+import sys
+import json
+import asyncio
+
+from dataclasses import replace
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from config.db_config import db_settings
+from app.invalidation import InvalidationBus, MAX_PAYLOAD
+
+settings = replace(db_settings, database=os.getenv("TEST_DB_NAME"))
+
+async def wait_for(condition, timeout: float = 10.0):
+
+    for _ in range(int(timeout / 0.05)):
+        if condition():
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError("condition not reached")
+
+def test_long_id_lists_are_sent_as_a_range():
+
+    bus = InvalidationBus(settings, True)
+
+    payload = json.loads(bus.encode({"k": "books", "ids": list(range(10, 5000))}))
+    assert payload["range"] == [10, 4999] and "ids" not in payload
+    assert payload["s"] == 1 and payload["w"] == bus.worker_id
+
+    payload = bus.encode({"k": "books", "ids": [1, 2]})
+    assert len(payload) < MAX_PAYLOAD and json.loads(payload)["s"] == 2
+
+@pytest.mark.asyncio
+async def test_messages_gaps_and_reconnects(session):
+
+    listener = InvalidationBus(settings, True, channel="test_invalidation", gap_timeout=0.2, max_backoff=0.5)
+    sender = InvalidationBus(settings, True, channel="test_invalidation",
+                             session_factory=async_sessionmaker(session.bind))
+    received = []
+
+    @listener.handler("books")
+    async def record(bus, message):
+        received.append(message)
+
+    @listener.on_flush
+    async def flushed(bus):
+        received.append("flush")
+
+    await listener.start()
+    try:
+        await wait_for(lambda: listener.connected)
+
+        # Only committed transactions notify; the listener ignores what it sent itself.
+        sender.publish(session, "books", ids=[1, 2])
+        listener.publish(session, "books", ids=[99])
+        await session.commit()
+        await session.execute(text("SELECT 1"))
+        sender.publish(session, "books", ids=[3])
+        await session.rollback()
+        sender.publish(session, "books", ids=[4])
+        await session.commit()
+
+        await wait_for(lambda: len(received) == 2)
+        assert received == [{"ids": [1, 2]}, {"ids": [4]}]
+        assert listener.flushes == 0
+
+        # A sequence number that never arrives is a lost message once gap_timeout passes.
+        next(sender._sequence)
+        sender.publish(session, "books", ids=[5])
+        await session.commit()
+
+        await wait_for(lambda: listener.flushes == 1)
+        assert received[-2:] == [{"ids": [5]}, "flush"]
+
+        # Whatever was sent while the listener was disconnected is gone too.
+        await session.execute(
+            text("SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE application_name = :name"),
+            {"name": f"invalidation-{listener.worker_id}"}
+        )
+        await session.commit()
+
+        await wait_for(lambda: listener.reconnects == 1 and listener.connected)
+        assert listener.flushes == 2
+
+        sender.publish(session, "books", ids=[6])
+        await session.commit()
+        await wait_for(lambda: received[-1] == {"ids": [6]})
+        assert listener.flushes == 2
+
+        # A commit that fails after taking its number hands it back, so receivers do not count it as lost.
+        await session.execute(text("CREATE TEMP TABLE deferred (id int UNIQUE DEFERRABLE INITIALLY DEFERRED)"))
+        await session.execute(text("INSERT INTO deferred VALUES (1), (1)"))
+        sender.publish(session, "books", ids=[7])
+        with pytest.raises(IntegrityError):
+            await session.commit()
+        await session.rollback()
+
+        await wait_for(lambda: not sender._pending and not sender._skipped)
+        await asyncio.sleep(0.5)
+        assert listener.flushes == 2
+        assert {"ids": [7]} not in received
+    finally:
+        await listener.stop()
@@ -0,0 +1,61 @@
+import sys
+import os
+import pytest
+
+from httpx import AsyncClient, ASGITransport
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from app.metrics import Histogram, http_requests, db_queries_per_request
+from app.main import app
+
+def test_histogram_renders_cumulative_buckets():
+
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, "/a")
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 4.25',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+@pytest.mark.asyncio
+async def test_requests_are_recorded_per_route_template(async_client: AsyncClient):
+
+    route = "/books/bookID={bookID}"
+    before = http_requests.value("GET", route, "404")
+    queries_before = db_queries_per_request.count("GET", route)
+
+    assert (await async_client.get("/books/bookID=987654")).status_code == 404
+    assert (await async_client.get("/books/bookID=987655")).status_code == 404
+    assert (await async_client.get("/no/such/path")).status_code == 404
+
+    assert http_requests.value("GET", route, "404") == before + 2
+    assert db_queries_per_request.count("GET", route) == queries_before + 2
+    assert http_requests.value("GET", "unmatched", "404") >= 1
+
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert f'http_requests_total{{method="GET",route="{route}",status="404"}} {before + 2}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/books/bookID={bookID}",le="+Inf"}' in body
+    assert 'db_query_duration_seconds_count{statement="SELECT"}' in body
+    assert 'db_queries_per_request_bucket{method="GET",route="/books/bookID={bookID}",le="1"}' in body
+    assert "http_requests_in_flight 1" in body
+
+@pytest.mark.asyncio
+async def test_stats_endpoints_need_a_login(async_client: AsyncClient):
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver") as anonymous:
+        for path in ("/pool-stats", "/books/cache-stats"):
+            assert (await anonymous.get(path)).status_code == 401
+            assert (await async_client.get(path)).status_code == 200
@@ -0,0 +1,62 @@
+import sys
+import os
+import logging
+import pytest
+
+from httpx import AsyncClient
+from sqlalchemy import insert
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import app.metrics
+from books.models import Genres
+
+BOOK = {
+    "title": "Budget Book",
+    "author": {"author_firstName": "Query", "author_lastName": "Budget"},
+    "genre": "Budgeting",
+    "pages": 120,
+    "publisher": "Budget Press",
+    "published_years": 2001,
+    "language": "English",
+    "isbn": "5550001112"
+}
+
+@pytest.mark.asyncio
+async def test_endpoint_query_budgets(async_client: AsyncClient, session, query_budget):
+
+    await session.execute(insert(Genres).values(id=300, genre_name="Budgeting"))
+    await session.commit()
+
+    response = await async_client.post("/books/create", json=BOOK)
+    assert response.status_code == 200
+    query_budget(response, queries=2, commits=1)
+    book_id = response.json()["book_id"]
+
+    response = await async_client.get(f"/books/bookID={book_id}")
+    assert response.status_code == 200
+    query_budget(response, queries=1, commits=0)
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+    response = await async_client.get("/books/search", params={"title": "Budget"})
+    assert response.status_code == 200
+    query_budget(response, queries=1, commits=0)
+
+    response = await async_client.delete(f"/books/delete={book_id}")
+    assert response.status_code == 200
+    query_budget(response, queries=1, commits=1)
+
+@pytest.mark.asyncio
+async def test_repeated_statement_shape_is_logged(async_client: AsyncClient, monkeypatch, caplog):
+
+    monkeypatch.setattr(app.metrics, "query_repeat_warn_threshold", 2)
+
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        stats = app.metrics.RequestStats("GET", "/books/loop")
+        for _ in range(3):
+            stats.record('SELECT "Book".id FROM "Book" WHERE "Book".id = $1', 0.001)
+
+    warnings = [record for record in caplog.records if "Possible N+1" in record.getMessage()]
+    assert len(warnings) == 1
+    assert "GET /books/loop" in warnings[0].getMessage()
+    assert stats.queries == 3
@@ -0,0 +1,100 @@
+import sys
+import os
+import asyncio
+import pytest
+
+from types import SimpleNamespace
+from httpx import AsyncClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from app.singleflight import SingleFlight
+from app.metrics import singleflight_coalesced
+
+primary = SimpleNamespace(bind=object())
+replica = SimpleNamespace(bind=object())
+
+@pytest.mark.asyncio
+async def test_identical_calls_share_one_run():
+
+    flights = SingleFlight("test_share")
+    release = asyncio.Event()
+    runs = []
+
+    async def read():
+        runs.append(1)
+        await release.wait()
+        return {"id": 1}
+
+    calls = [asyncio.create_task(flights.do(primary, "book-1", read)) for _ in range(5)]
+    other = asyncio.create_task(flights.do(replica, "book-1", read))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*calls) == [{"id": 1}] * 5
+    assert await other == {"id": 1}
+    assert len(runs) == 2
+    assert singleflight_coalesced.value("test_share") == 4
+    assert flights.stats()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_errors_reach_waiters_and_cancelled_leaders_hand_over():
+
+    flights = SingleFlight("test_errors")
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise ValueError("boom")
+
+    calls = [asyncio.create_task(flights.do(primary, "key", failing)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+    blocked = asyncio.Event()
+
+    async def slow():
+        await blocked.wait()
+        return "done"
+
+    leader = asyncio.create_task(flights.do(primary, "key", slow))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(flights.do(primary, "key", slow))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    blocked.set()
+    assert await waiter == "done"
+
+@pytest.mark.asyncio
+async def test_forget_starts_a_fresh_read():
+
+    flights = SingleFlight("test_forget")
+    release = asyncio.Event()
+    values = iter(["before", "after"])
+
+    async def read():
+        value = next(values)
+        await release.wait()
+        return value
+
+    first = asyncio.create_task(flights.do(primary, "key", read))
+    await asyncio.sleep(0)
+    flights.forget()
+    second = asyncio.create_task(flights.do(primary, "key", read))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert (await first, await second) == ("before", "after")
+
+@pytest.mark.asyncio
+async def test_concurrent_book_reads_are_coalesced(async_client: AsyncClient):
+
+    responses = await asyncio.gather(*(async_client.get("/books/bookID=1") for _ in range(10)))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len({response.text for response in responses}) == 1
+    assert sum(int(response.headers["x-db-queries"]) for response in responses) < 10
@@ -0,0 +1,98 @@
+import pytest
+import os
+import sys
+
+from httpx import AsyncClient
+from sqlalchemy import insert
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from books.models import Genres
+from books.schemas import BookSearch
+from books.search_cache import MemoryBackend, ExternalBackend, LocalStore, SearchCache, search_cache, build_backend
+
+@pytest.mark.asyncio
+async def test_memory_backend_evicts_lru_and_expired():
+
+    backend = MemoryBackend(max_size=2, ttl=60)
+    await backend.set("a", 1)
+    await backend.set("b", 2)
+    assert await backend.get("a") == 1
+    await backend.set("c", 3)
+
+    assert await backend.get("b") is None
+    assert await backend.get("a") == 1
+
+    backend.ttl = -1
+    await backend.set("d", 4)
+    assert await backend.get("d") is None
+
+    await backend.bump()
+    assert await backend.version() == 1
+    assert await backend.get("a") is None
+
+def test_memory_backend_needs_invalidation_bus():
+
+    # Its version is per worker; without the bus other workers would keep serving results a write made stale.
+    with pytest.raises(RuntimeError, match="INVALIDATION_BUS"):
+        build_backend("memory")
+
+    assert build_backend("off") is None
+
+@pytest.mark.asyncio
+async def test_cache_keys_and_versions_on_external_backend():
+
+    cache = SearchCache(ExternalBackend(LocalStore(), ttl=60))
+
+    key = cache.key(BookSearch(title="Dune", genre=""), 5, 0, False, "offset", 0)
+    assert key == cache.key(BookSearch(title="dUNE"), 5, 0, False, "offset", 0)
+    assert key != cache.key(BookSearch(title="Dune"), 5, 5, False, "offset", 0)
+    assert cache.key(BookSearch(), 5, 0, False, "cursor", 7) != cache.key(BookSearch(), 5, 0, False, "cursor", 8)
+
+    version, value = await cache.lookup(key)
+    assert value is None
+    await cache.store(version, key, {"books": [{"id": 1}], "limit": 5, "offset": 0})
+    assert (await cache.lookup(key))[1] == {"books": [{"id": 1}], "limit": 5, "offset": 0}
+
+    # The bump is scheduled by the commit hook; the next lookup waits for it.
+    cache.bump()
+    assert (await cache.lookup(key))[1] is None
+    assert cache.hits == 1 and cache.misses == 2
+
+@pytest.mark.asyncio
+async def test_search_results_cached_until_catalog_changes(async_client: AsyncClient, session, query_budget):
+
+    await session.execute(insert(Genres).values(id=600, genre_name="Cached"))
+    await session.commit()
+
+    params = {"genre": "Cached"}
+
+    response = await async_client.get("/books/search", params=params)
+    assert response.json()["books"] == []
+
+    response = await async_client.get("/books/search", params={"genre": "CACHED"})
+    assert response.json()["books"] == []
+    query_budget(response, queries=0)
+
+    response = await async_client.post("/books/create", json={
+        "title": "Cached Result",
+        "author": {"author_firstName": "Cache", "author_lastName": "Writer"},
+        "genre": "Cached",
+        "pages": 90,
+        "publisher": "Cache Press",
+        "published_years": 2010,
+        "language": "English",
+        "isbn": "6660001112"
+    })
+    assert response.status_code == 200
+    book_id = response.json()["book_id"]
+
+    response = await async_client.get("/books/search", params=params)
+    assert [book["id"] for book in response.json()["books"]] == [book_id]
+
+    response = await async_client.delete(f"/books/delete={book_id}")
+    assert response.status_code == 200
+
+    response = await async_client.get("/books/search", params=params)
+    assert response.json()["books"] == []
+    assert search_cache.stats()["hits"] >= 1
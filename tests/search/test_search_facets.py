@@ -0,0 +1,70 @@
+import pytest
+import os
+import sys
+
+from httpx import AsyncClient
+from sqlalchemy import insert
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from books.models import Genres
+from books.schemas import BookSearch
+from books.utils import count_matches
+
+@pytest.mark.asyncio
+async def test_search_facets_and_totals(async_client: AsyncClient, session, query_budget):
+
+    await session.execute(insert(Genres).values(id=700, genre_name="Faceted"))
+    await session.commit()
+
+    book_ids = []
+    for number, (language, publisher) in enumerate([("English", "Facet Press"), ("English", "Facet Press"),
+                                                     ("French", "Other Press")]):
+        response = await async_client.post("/books/create", json={
+            "title": f"Faceted Book {number}",
+            "author": {"author_firstName": "Facet", "author_lastName": "Writer"},
+            "genre": "Faceted",
+            "pages": 100,
+            "publisher": publisher,
+            "published_years": 2001,
+            "language": language,
+            "isbn": f"777000111{number}"
+        })
+        assert response.status_code == 200
+        book_ids.append(response.json()["book_id"])
+
+    params = {"genre": "Faceted", "limit": 1, "facets": "true", "total": "true"}
+    response = await async_client.get("/books/search", params=params)
+    assert response.status_code == 200
+    page = response.json()
+    query_budget(response, queries=2)
+
+    assert len(page["books"]) == 1
+    assert page["total"] == 3 and page["total_exact"] is True
+    assert page["facets"] == {
+        "genre": [{"value": "Faceted", "count": 3}],
+        "language": [{"value": "English", "count": 2}, {"value": "French", "count": 1}],
+        "published_years": [{"value": 2001, "count": 3}],
+        "publisher": [{"value": "Facet Press", "count": 2}, {"value": "Other Press", "count": 1}],
+    }
+
+    # Either part can be asked for alone, and each combination is cached under its own key.
+    response = await async_client.get("/books/search", params={"genre": "Faceted", "total": "true"})
+    assert response.json()["total"] == 3 and "facets" not in response.json()
+    response = await async_client.get("/books/search", params={"genre": "Faceted", "facets": "true"})
+    assert "total" not in response.json() and len(response.json()["facets"]["language"]) == 2
+
+    response = await async_client.get("/books/search", params={"genre": "No Such Genre", "facets": "true",
+                                                               "total": "true"})
+    assert response.json()["total"] == 0
+    assert response.json()["facets"] == {"genre": [], "language": [], "published_years": [], "publisher": []}
+
+    # Past the exact limit the count stops early and the planner estimates the rest.
+    assert await count_matches(session, BookSearch(genre="Faceted"), exact_limit=3) == (3, True)
+    estimate, exact = await count_matches(session, BookSearch(genre="Faceted"), exact_limit=1)
+    assert not exact and estimate >= 2
+    await session.rollback()
+
+    for book_id in book_ids:
+        response = await async_client.delete(f"/books/delete={book_id}")
+        assert response.status_code == 200
@@ -0,0 +1,116 @@
+import pytest
+import os
+import sys
+
+from httpx import AsyncClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from books.schemas import BookSearch
+from books.search_index import InvertedIndex, SearchEngine, search_engine
+
+def make_book(book_id, title, first_name="Jane", last_name="Austen", genre="Romance", year=1813, isbn=None):
+
+    return {
+        "id": book_id,
+        "title": title,
+        "published_years": year,
+        "isbn": isbn or f"isbn-{book_id}",
+        "pages": 300,
+        "publisher": "Publisher",
+        "language": "English",
+        "author_firstName": first_name,
+        "author_lastName": last_name,
+        "genre_name": genre,
+    }
+
+def titles(books):
+
+    return [book["title"] for book in books]
+
+def test_inverted_index_filters():
+
+    index = InvertedIndex()
+    index.upsert(make_book(1, "Pride and Prejudice"))
+    index.upsert(make_book(2, "Emma", year=1815))
+    index.upsert(make_book(3, "The Hobbit", "John", "Tolkien", "Fantasy", 1937))
+    index.upsert(make_book(4, "The Silmarillion", "John", "Tolkien", "Fantasy", 1977))
+
+    assert titles(index.search(BookSearch(title="PREJ"), 10)) == ["Pride and Prejudice"]
+    assert titles(index.search(BookSearch(title="th"), 10)) == ["The Hobbit", "The Silmarillion"]
+    assert titles(index.search(BookSearch(author_lastName="tolk", published_years=1977), 10)) == ["The Silmarillion"]
+    assert titles(index.search(BookSearch(genre="roman", author_firstName="ja"), 10)) == ["Pride and Prejudice", "Emma"]
+    assert titles(index.search(BookSearch(isbn="isbn-3"), 10)) == ["The Hobbit"]
+    assert index.search(BookSearch(title="Dracula"), 10) == []
+    assert titles(index.search(BookSearch(), 2, offset=1)) == ["Emma", "The Hobbit"]
+    assert titles(index.search(BookSearch(), 2, after_id=2)) == ["The Hobbit", "The Silmarillion"]
+
+def test_inverted_index_updates_and_removals():
+
+    index = InvertedIndex()
+    index.upsert(make_book(1, "Pride and Prejudice"))
+    index.upsert(make_book(2, "Emma"))
+
+    index.update(1, {"title": "Sense and Sensibility", "genre_name": "Classic"})
+    index.remove(2)
+    index.upsert(make_book(5, "Persuasion"))
+    index.upsert(make_book(3, "Mansfield Park"))
+
+    assert index.search(BookSearch(title="Prejudice"), 10) == []
+    assert titles(index.search(BookSearch(title="sensibility", genre="classic"), 10)) == ["Sense and Sensibility"]
+    assert index.search(BookSearch(title="Emma"), 10) == []
+    assert titles(index.search(BookSearch(), 10, after_id=1)) == ["Mansfield Park", "Persuasion"]
+    assert len(index) == 3
+
+@pytest.mark.asyncio
+async def test_memory_search_matches_database(async_client: AsyncClient, session):
+
+    queries = [{"title": "Book"}, {"title": "Cursor", "limit": 3}, {"genre": "fic"}, {"author_lastName": "Turner"}]
+
+    expected = []
+    for params in queries:
+        response = await async_client.get("/books/search", params={"limit": 100, **params, "pagination": "cursor"})
+        expected.append(response.json())
+
+    assert any(result["books"] for result in expected)
+
+    search_engine.enabled = True
+    try:
+        await search_engine.build(session)
+        await session.rollback()
+
+        for params, database_result in zip(queries, expected):
+            response = await async_client.get("/books/search", params={"limit": 100, **params, "pagination": "cursor"})
+            assert response.json() == database_result
+
+        book_data = {
+            "title": "Indexed Incrementally",
+            "author": {"author_firstName": "Ada", "author_lastName": "Index"},
+            "genre": "Fantasy",
+            "pages": 120,
+            "publisher": "Test Publisher",
+            "published_years": 2020,
+            "language": "English",
+            "isbn": "indexed-1"
+        }
+        response = await async_client.post("/books/create", json=book_data)
+        book_id = response.json()["book_id"]
+
+        response = await async_client.get("/books/search", params={"title": "incrementally"})
+        assert [book["id"] for book in response.json()["books"]] == [book_id]
+
+        response = await async_client.delete(f"/books/delete={book_id}")
+        assert response.status_code == 200
+
+        response = await async_client.get("/books/search", params={"title": "incrementally"})
+        assert response.json()["books"] == []
+    finally:
+        search_engine.enabled = False
+        search_engine.index = None
+
+def test_memory_index_needs_invalidation_bus():
+
+    with pytest.raises(RuntimeError, match="INVALIDATION_BUS"):
+        SearchEngine(True)
+
+    assert not SearchEngine(False).ready
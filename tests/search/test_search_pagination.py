@@ -0,0 +1,51 @@
+import pytest
+import os
+import sys
+
+from httpx import AsyncClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+@pytest.mark.asyncio
+async def test_search_cursor_pagination(async_client: AsyncClient, session):
+
+    for number in range(5):
+        book_data = {
+            "title": f"Cursor Book {number}",
+            "author": {"author_firstName": "Page", "author_lastName": "Turner"},
+            "genre": "Fantasy",
+            "pages": 100 + number,
+            "publisher": "Test Publisher",
+            "published_years": 2020,
+            "language": "English",
+            "isbn": f"cursor-{number}"
+        }
+        response = await async_client.post("/books/create", json=book_data)
+        assert response.status_code == 200
+
+    seen = []
+    params = {"title": "Cursor Book", "limit": 2, "pagination": "cursor"}
+
+    while True:
+        response = await async_client.get("/books/search", params=params)
+        assert response.status_code == 200
+        data = response.json()
+        seen.extend(book["id"] for book in data["books"])
+
+        if data["next_cursor"] is None:
+            break
+        params = {"title": "Cursor Book", "limit": 2, "cursor": data["next_cursor"]}
+
+    assert len(seen) == 5
+    assert seen == sorted(seen)
+
+    response = await async_client.get("/books/search", params={"title": "Cursor Book", "limit": 100})
+    assert sorted(book["id"] for book in response.json()["books"]) == seen
+
+@pytest.mark.asyncio
+async def test_search_invalid_cursor(async_client: AsyncClient, session):
+
+    response = await async_client.get("/books/search", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
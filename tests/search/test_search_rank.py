@@ -0,0 +1,46 @@
+import pytest
+import os
+import sys
+
+from httpx import AsyncClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+@pytest.mark.asyncio
+async def test_search_ranks_by_similarity(async_client: AsyncClient, session, require_pg_trgm):
+
+    # Created longest title first, so ranking by similarity is the reverse of id order.
+    book_ids = []
+    for number, title in enumerate(["The Long Zyxwa Chronicles Omnibus", "Zyxwa Chronicles", "Zyxwa"]):
+        response = await async_client.post("/books/create", json={
+            "title": title,
+            "author": {"author_firstName": "Rank", "author_lastName": "Order"},
+            "genre": "Fantasy",
+            "pages": 100,
+            "publisher": "Test Publisher",
+            "published_years": 2020,
+            "language": "English",
+            "isbn": f"rank-{number}"
+        })
+        assert response.status_code == 200
+        book_ids.append(response.json()["book_id"])
+
+    response = await async_client.get("/books/search", params={"title": "zyxwa", "rank": "true", "limit": 10})
+    assert response.status_code == 200
+    books = response.json()["books"]
+
+    assert [book["id"] for book in books] == book_ids[::-1]
+    assert [book["relevance"] for book in books] == sorted((book["relevance"] for book in books), reverse=True)
+    assert books[0]["relevance"] == 1.0
+
+    for book_id in book_ids:
+        response = await async_client.delete(f"/books/delete={book_id}")
+        assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_search_rank_rejects_cursor(async_client: AsyncClient):
+
+    response = await async_client.get("/books/search", params={"title": "zyxwa", "rank": "true",
+                                                               "pagination": "cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cursor pagination cannot be combined with rank"